@@ -0,0 +1,241 @@
+#!/usr/bin/env python
+
+"""This script benchmarks the calculator pipeline and the modules.
+
+Every benchmark is timed several times; the best time per call is
+compared with the baseline stored in baseline.json (noise only makes a
+benchmark slower) and the spread of the times (the median over the best)
+is its noise band. Benchmarks slower than the baseline by more than the
+threshold beyond the noise bands of both runs (and by more than their
+minimum delta, so that noise in very fast benchmarks is ignored) are
+timed again, and if they are still slower they are reported as
+regressions (the script exits with status 1). The times are scaled by a
+calibration workload timed together with the baseline, so that a machine
+that is busier than usual does not slow everything.
+
+Usage (from the repository root):
+python benchmarks/bench.py [NAME ...] [--save] [--threshold RATIO]
+  NAME -- run only the benchmarks whose names contain NAME,
+  --save -- store the measured times as the new baseline,
+  --threshold -- the allowed slowdown ratio (1.3 by default).
+
+The baseline is local to the machine (and ignored by git); run with
+--save before making changes and compare afterwards on the same machine.
+"""
+
+import json
+import statistics
+import os
+import subprocess
+import sys
+import timeit
+
+from decimal import Decimal
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC = os.path.join(ROOT, 'src')
+sys.path.insert(0, SRC)
+
+from clic.calculator import Calculator  # noqa: E402
+from clic.mathclasses import Array, Quantity  # noqa: E402
+import clic.mathclasses as META  # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+THRESHOLD = 1.3
+REPEAT = 15
+# Slowdowns smaller than this (in seconds) are noise, not regressions
+MIN_DELTA = 100e-6
+MIN_DELTAS = {
+    'calculator.construct': 5e-3,
+    'calculator.load_modules': 5e-3,
+    'cli.startup': 30e-3,
+}
+
+EXPRESSION = ('sin 30° + 2 m * 3 s^-1 : (4 km/h) + Sum [1; 2; 3]^2'
+              ' + log(2; 8) - 5! : 3')
+
+
+def pipeline_benchmarks(ctor):
+    """Return the benchmarks of the stages of Calculator.calculate."""
+    split = ctor.split(EXPRESSION)[0]
+    tokens = ctor.tokenize(split)
+    infix = ctor.complete_infix_notation(tokens)
+    postfix = ctor.shunting_yard_algorithm(infix)
+    return {
+        'calculator.construct': Calculator,
+        'calculator.reset_vars': ctor.reset_vars,
+        'calculator.load_modules':
+            lambda: (ctor.reset_vars(), ctor.update_modules()),
+        'pipeline.split': lambda: ctor.split(EXPRESSION),
+        'pipeline.tokenize': lambda: ctor.tokenize(list(split)),
+        'pipeline.complete_infix_notation':
+            lambda: ctor.complete_infix_notation(list(tokens)),
+        'pipeline.shunting_yard_algorithm':
+            lambda: ctor.shunting_yard_algorithm(list(infix)),
+        'pipeline.optimize': lambda: ctor.optimize(list(postfix)),
+        'pipeline.perform_operations_twice':
+            lambda: ctor.perform_operations_twice(list(postfix)),
+        'pipeline.calculate': lambda: ctor.calculate(EXPRESSION),
+    }
+
+
+def module_benchmarks():
+    """Return the benchmarks of the hot functions of the modules."""
+    comb = sys.modules['comb']
+    chem = sys.modules['chem']
+    stats = sys.modules['stats']
+    angle = Quantity.angle(Decimal('0.5'))
+    large = Array()
+    large.ls = [Decimal(i * 7919 % 100003) for i in range(100000)]
+    mass = chem.mass_precision()
+
+    def molar_mass_cold():
+        chem.parse_formula.cache_clear()
+        return mass('K4[Fe(CN)6]*3H2O', META)
+
+    return {
+        'mathclasses.Quantity.sin': lambda: Quantity.sin(angle),
+        'comb.factorial(1000)': lambda: comb.factorial(Decimal(1000)),
+        'comb.factorial(10^6)': lambda: comb.factorial(Decimal(10 ** 6)),
+        'comb.prime_factor(2^64+1)':
+            lambda: comb.prime_factor(Decimal(2 ** 64 + 1)),
+        'chem.mass_precision': lambda: mass('K4[Fe(CN)6]*3H2O', META),
+        'chem.mass_precision(cold)': molar_mass_cold,
+        'stats.mean(10^5)': lambda: stats.mean(large),
+        'stats.variance(10^5)': lambda: stats.variance(large),
+        'stats.median(10^5)': lambda: stats.median(large),
+    }
+
+
+def calibration():
+    """A fixed workload for measuring the speed of the machine."""
+    total = Decimal(0)
+    for i in range(1000):
+        total += Decimal(i) * Decimal('1.5')
+    return sorted(str(i) for i in range(1000))
+
+
+def cli_startup():
+    """Run the command line calculator once in a new process."""
+    env = dict(os.environ, PYTHONPATH=SRC)
+    subprocess.run(
+        [sys.executable, '-m', 'clic', '1 + 1'],
+        env=env, check=True, stdout=subprocess.DEVNULL,
+    )
+
+
+def measure(function, repeat=REPEAT):
+    """Return the best time of a single call of function and its noise.
+
+    The noise is the relative spread of the times (median / best - 1).
+    """
+    if function is cli_startup:
+        # Each run takes a new process, a few runs are enough
+        times = timeit.repeat(function, repeat=5, number=1)
+    else:
+        timer = timeit.Timer(function)
+        number, _ = timer.autorange()
+        times = [t / number for t in timer.repeat(repeat=repeat,
+                                                  number=number)]
+    best = min(times)
+    return best, statistics.median(times) / best - 1
+
+
+def is_regression(name, seconds, band, baseline, speed, threshold):
+    """Return whether the scaled time is slower than the baseline.
+
+    The slowdown must exceed the threshold beyond the noise band.
+    """
+    seconds /= speed
+    ratio = seconds / baseline[name]
+    return ratio / (1 + band) > threshold \
+        and seconds - baseline[name] > MIN_DELTAS.get(name, MIN_DELTA)
+
+
+def read_baseline():
+    """Return the stored baseline (an empty dictionary if there is none)."""
+    if not os.path.exists(BASELINE_PATH):
+        return dict()
+    with open(BASELINE_PATH) as file:
+        return json.load(file)
+
+
+def format_time(seconds):
+    """Return a time as a string with a suitable unit."""
+    for unit, scale in [('s', 1), ('ms', 1e-3), ('µs', 1e-6)]:
+        if seconds >= scale:
+            return f'{seconds / scale:8.2f} {unit}'
+    return f'{seconds / 1e-9:8.2f} ns'
+
+
+def main(args):
+    """Run the benchmarks according to the command line arguments."""
+    save = '--save' in args
+    threshold = THRESHOLD
+    names = []
+    args = iter(args)
+    for arg in args:
+        if arg == '--threshold':
+            threshold = float(next(args))
+        elif arg != '--save':
+            names.append(arg)
+    ctor = Calculator()
+    benchmarks = pipeline_benchmarks(ctor) | module_benchmarks()
+    benchmarks['cli.startup'] = cli_startup
+    if names:
+        benchmarks = {
+            name: function for name, function in benchmarks.items()
+            if any(part in name for part in names)
+        }
+    baseline = read_baseline()
+    noise = baseline.pop('noise', dict())
+    results = dict()
+    results['calibration'], noise_now = measure(calibration)
+    new_noise = {'calibration': noise_now}
+    # How much slower the machine is now than when the baseline was saved
+    speed = results['calibration'] / baseline.get(
+        'calibration', results['calibration']
+    )
+    regressions = []
+    for name, function in benchmarks.items():
+        seconds, noise_now = measure(function)
+        band = noise_now + noise.get(name, 0)
+        regression = name in baseline and is_regression(
+            name, seconds, band, baseline, speed, threshold
+        )
+        if regression:
+            # Time it again to tell a regression from a burst of noise
+            again, noise_again = measure(function)
+            if again < seconds:
+                seconds, noise_now = again, noise_again
+                band = noise_now + noise.get(name, 0)
+            regression = is_regression(
+                name, seconds, band, baseline, speed, threshold
+            )
+        results[name] = seconds
+        new_noise[name] = noise_now
+        line = f'{name:40} {format_time(seconds)}'
+        if name in baseline:
+            ratio = seconds / speed / baseline[name]
+            line += f'  x{ratio:.2f} ±{band:.2f}'
+            if regression:
+                line += '  REGRESSION'
+                regressions.append(name)
+        print(line)
+    if not baseline and not save:
+        print('no baseline to compare with (run with --save first)')
+    if save:
+        with open(BASELINE_PATH, 'w') as file:
+            results['noise'] = noise | new_noise
+            json.dump(baseline | results, file, indent=2, sort_keys=True)
+            file.write('\n')
+        print(f'baseline saved to {BASELINE_PATH}')
+    elif regressions:
+        print(f'{len(regressions)} regression(s) over x{threshold} beyond '
+              'the noise: ' + ', '.join(regressions))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
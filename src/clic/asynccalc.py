@@ -0,0 +1,159 @@
+"""This module provides an asynchronous wrapper of the calculator.
+
+AsyncCalculator calculates every expression in a forked worker process, so
+the event loop is never blocked and a runaway calculation (e.g. (10^7)!)
+can be killed. The worker starts with a copy of the calculator and sends
+back the answer and the changed variables; they are applied only when the
+calculation is finished, so an aborted calculation changes nothing.
+Hooks registered on the calculator are called in the worker process.
+"""
+
+import asyncio
+import multiprocessing
+import pickle
+
+from clic.calculator import Calculator
+
+
+class CalculationTimeout(Exception):
+    """An error class for calculations that took too long."""
+
+
+def picklable(err):
+    """Return err or a plain copy of it if it cannot be pickled."""
+    try:
+        pickle.dumps(err)
+    except Exception:
+        return Exception(str(err))
+    return err
+
+
+def worker(ctor, expr, conn):
+    """Calculate expr and send the changes of the calculator to conn."""
+    before = dict(ctor.vars)
+    try:
+        ctor.calculate(expr)
+    except SystemExit:
+        conn.send(('exit', None))
+        return
+    changed = {
+        name: token.calc() for name, token in ctor.vars.items()
+        if before.get(name) is not token
+    }
+    removed = [name for name in before if name not in ctor.vars]
+    state = {
+        'err': picklable(ctor.err),
+        'link': ctor.link,
+        'binding': ctor.binding,
+        'silent': ctor.silent,
+        'full_output': ctor.full_output,
+        'profile': ctor.profile,
+        'definitions': ctor.definitions,
+        'dependents': ctor.dependents,
+    }
+    try:
+        conn.send(('done', (changed, removed, state)))
+    except Exception as err:
+        conn.send(('error', picklable(err)))
+
+
+class AsyncCalculator:
+    """The AsyncCalculator object calculates expressions asynchronously.
+
+    The answers are read with get_answer (like the answers of Calculator).
+    Calculations are run one at a time; the worker processes need the
+    'fork' start method (it is not available on Windows).
+    """
+
+    def __init__(self, calculator=None):
+        """The initialiser of the class.
+
+        Arguments:
+        calculator -- the Calculator to use (optional, a new one is created
+          by default).
+        """
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            raise RuntimeError('AsyncCalculator needs the fork start method')
+        self.context = multiprocessing.get_context('fork')
+        if calculator is None:
+            calculator = Calculator()
+        self.calculator = calculator
+        self.lock = None
+
+    async def evaluate(self, expr, timeout=None):
+        """Calculate expression expr in a worker process.
+
+        Arguments:
+        expr -- the expression (a string),
+        timeout -- the maximum time of the calculation in seconds (optional,
+          by default there is no limit).
+
+        Returns the answer as get_answer. The worker is killed when the
+        calculation times out or the task is cancelled; the variables of
+        the calculator are then left unchanged.
+        """
+        if self.lock is None:
+            self.lock = asyncio.Lock()
+        async with self.lock:
+            try:
+                result = await self.run_worker(expr, timeout)
+            except asyncio.TimeoutError:
+                self.calculator.err = CalculationTimeout(
+                    f'calculation timed out after {timeout} s'
+                )
+            except Exception as err:
+                self.calculator.err = err
+            else:
+                self.apply(*result)
+            return self.get_answer()
+
+    async def run_worker(self, expr, timeout):
+        """Return the result of the worker calculating expr."""
+        loop = asyncio.get_running_loop()
+        receiver, sender = self.context.Pipe(duplex=False)
+        process = self.context.Process(
+            target=worker, args=(self.calculator, expr, sender), daemon=True
+        )
+        ready = loop.create_future()
+
+        def on_ready():
+            if not ready.done():
+                ready.set_result(None)
+
+        try:
+            process.start()
+            # Only the worker may write, so a closed pipe means it died
+            sender.close()
+            loop.add_reader(receiver.fileno(), on_ready)
+            try:
+                await asyncio.wait_for(ready, timeout)
+            finally:
+                loop.remove_reader(receiver.fileno())
+            try:
+                status, result = receiver.recv()
+            except EOFError:
+                raise Calculator.CompilationError('the calculation crashed')
+        finally:
+            if process.is_alive():
+                process.kill()
+            process.join()
+            receiver.close()
+        if status == 'exit':
+            raise SystemExit()
+        if status == 'error':
+            raise result
+        return result
+
+    def apply(self, changed, removed, state):
+        """Apply the changes made by a worker to the calculator."""
+        ctor = self.calculator
+        for name in removed:
+            del ctor.vars[name]
+        for name, value in changed.items():
+            ctor.assign_ans(value, link=name)
+        for name, value in state.items():
+            setattr(ctor, name, value)
+
+    def get_answer(self, fmt=None):
+        """Return the answer of the last expression (see Calculator)."""
+        return self.calculator.get_answer(fmt)
@@ -0,0 +1,107 @@
+"""This module limits the resources a calculation may use.
+
+The limits are set in the budget section of the config (0 means no limit):
+the number of token calls, the length of arrays, the number of digits of
+exact integers and the wall time of a calculation. The calculator starts
+the budget for every calculation; the hot loops of the math classes and of
+the modules report their progress to BUDGET, which raises BudgetError when
+a limit is exceeded.
+"""
+
+import math
+import time
+
+
+class BudgetError(Exception):
+    """An error class for calculations exceeding a budget."""
+
+
+class Budget:
+    """The Budget object checks the limits of the current calculation."""
+
+    # The wall time is checked about this often (in seconds); the number
+    # of ticks between the checks adapts to how long the ticks take
+    check_period = 0.01
+    max_interval = 1024
+
+    def __init__(self):
+        """The initialiser of the class."""
+        self.start()
+
+    def start(self, calls=0, array_length=0, digits=0, time_limit=0):
+        """Start a calculation with the given limits (0 means no limit)."""
+        self.calls_left = calls or None
+        self.array_length = array_length
+        self.digits = digits
+        self.time_limit = time_limit
+        self.deadline = None
+        if time_limit:
+            self.deadline = time.monotonic() + time_limit
+        self.reset_ticks()
+
+    def reset_ticks(self):
+        """Start counting the ticks between the checks of the wall time."""
+        self.ticks = 0
+        self.interval = 1
+        self.last_check = time.monotonic()
+
+    def state(self):
+        """Return the limits of the current calculation (see resume)."""
+        return (self.calls_left, self.array_length, self.digits,
+                self.time_limit, self.deadline)
+
+    def resume(self, state):
+        """Continue a calculation in another (forked) process."""
+        (self.calls_left, self.array_length, self.digits,
+         self.time_limit, self.deadline) = state
+        self.reset_ticks()
+
+    def call(self):
+        """Count a token call."""
+        if self.calls_left is not None:
+            self.calls_left -= 1
+            if self.calls_left < 0:
+                raise BudgetError('too many operations')
+        self.tick()
+
+    def tick(self):
+        """Count a step of a loop (checking the wall time now and then)."""
+        self.ticks += 1
+        if self.deadline is None or self.ticks < self.interval:
+            return
+        now = time.monotonic()
+        # Check more often if the ticks are slow, less often if fast
+        if now - self.last_check > self.check_period:
+            self.interval = max(self.interval // 2, 1)
+        elif now - self.last_check < self.check_period / 2:
+            self.interval = min(self.interval * 2, self.max_interval)
+        self.ticks = 0
+        self.last_check = now
+        self.check_time()
+
+    def check_time(self):
+        """Raise an error if the calculation took too long."""
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise BudgetError(
+                f'calculation took longer than {self.time_limit} s'
+            )
+
+    def check_length(self, n):
+        """Raise an error if an array of length n is too long."""
+        if self.array_length and n > self.array_length:
+            raise BudgetError(
+                f'array longer than {self.array_length} elements'
+            )
+
+    def check_digits(self, n):
+        """Raise an error if an integer of n digits is too long."""
+        if self.digits and n > self.digits:
+            raise BudgetError(f'integer longer than {self.digits} digits')
+
+    def check_integer(self, n):
+        """Raise an error if the int n has too many digits."""
+        if self.digits:
+            self.check_digits(int(n.bit_length() * math.log10(2)) + 1)
+
+
+BUDGET = Budget()
@@ -16,11 +16,20 @@ from clic.mathclasses import decimal_to_string
 from clic.mathclasses import UnknownName
 
 from clic.token import Token
+from clic.optimizer import CALCULATION_ERRORS, optimize
+from clic import session
+from clic.output import FORMATS
+from clic.hooks import Hooks
+from clic.budget import BUDGET
+from clic import parallel
+from clic.profile import Profile
 from clic.setup import CLIC_TOKENS as default_token_args
 from clic.setup import CLIC_MAPPINGS as default_mappings
 
-import importlib
+import hashlib
+import importlib.util
 import os
+import time
 
 
 class Calculator:
@@ -41,9 +50,19 @@ class Calculator:
             self.config = config
         self.err = None
         self.link = self.config['expression']['answer_name']
+        self.binding = False
         self.silent = False
+        self.full_output = False
+        self.hooks = Hooks()
+        self.profile = None
+        # Allow huge results (e.g. factorials) beyond 10^999999
+        decimal.getcontext().Emax = decimal.MAX_EMAX
+        decimal.getcontext().Emin = decimal.MIN_EMIN
+        parallel.set_workers(self.config['global']['workers'])
         self.reset_vars()
         self.update_modules()
+        # The tokens defined by the calculator and the modules
+        self.builtin = dict(self.vars)
         self.helptext = self.config['system']['help_text']
 
     def reset_vars(self):
@@ -55,6 +74,14 @@ class Calculator:
             for token in tokens:
                 self.vars.update({token.name: token})
         self.completion = default_mappings
+        self.display_units = []
+        self.prefixes = dict()
+        self.unit_table = None
+        self.resolvers = []
+        self.resolved = dict()
+        # Reactive variables: {name: expression} and {name: dependents}
+        self.definitions = dict()
+        self.dependents = dict()
 
     def update_modules(self):
         """Update the list of all modules."""
@@ -98,12 +125,21 @@ class Calculator:
                     spec.loader.exec_module(module)
 
                     for token_args in module.CLIC_TOKENS:
-                        tokens = Token.from_config(*token_args)
+                        tokens = Token.from_config(
+                            *token_args, module=module_name
+                        )
                         for token in tokens:
-                            token.module = module_name
                             self.vars.update({token.name: token})
                     if hasattr(module, 'CLIC_MAPPINGS'):
                         self.completion.update(module.CLIC_MAPPINGS)
+                    if hasattr(module, 'CLIC_RESOLVER'):
+                        self.resolvers.append(
+                            (module_name, module.CLIC_RESOLVER)
+                        )
+                    if hasattr(module, 'CLIC_DISPLAY_UNITS'):
+                        self.display_units += module.CLIC_DISPLAY_UNITS
+                    if hasattr(module, 'CLIC_PREFIXES'):
+                        self.prefixes.update(module.CLIC_PREFIXES)
                 except AttributeError:
                     raise Calculator.CompilationError(
                         f"invalid module: '{module}'",
@@ -115,6 +151,28 @@ class Calculator:
             link = '__ans__'
         self.vars |= {link: Token.wrap(ans, name=link)}
 
+    def resolve(self, word):
+        """Return the token called word or None if there is no such token.
+
+        Names that are not variables are passed to the resolvers of the
+        modules (e.g. for prefixed units like 'kN'); resolved tokens are
+        cached.
+        """
+        if word in self.vars:
+            return self.vars[word]
+        if word not in self.resolved:
+            self.resolved[word] = None
+            for module_name, resolver in self.resolvers:
+                token_args = resolver(word)
+                if token_args is not None:
+                    tokens = Token.from_config(
+                        *token_args, module=module_name
+                    )
+                    for token in tokens:
+                        self.resolved[token.name] = token
+                    break
+        return self.resolved[word]
+
     def isalphaplus(self, x):
         """Return whether x is alphabetical / semi-alphabetical or not."""
         return (x.isalpha() and x.isascii()) \
@@ -218,6 +276,34 @@ class Calculator:
         # quit the calculator
         if ls[0] == 'exit':
             sys.exit()
+        # show the whole last answer
+        elif ls == ['full']:
+            self.full_output = True
+            self.silent = False
+            return True
+        # save the user variables
+        elif ls[0] == 'save':
+            name = ''.join(ls[1:]) or 'default'
+            count = self.save_session(name)
+            self.assign_ans(f"saved {count} variables to session '{name}'")
+            self.silent = False
+            return True
+        # restore saved variables
+        elif ls[0] == 'restore':
+            name = ''.join(ls[1:]) or 'default'
+            count = self.load_session(name)
+            self.assign_ans(
+                f"restored {count} variables from session '{name}'"
+            )
+            self.silent = False
+            return True
+        # profile the calculation of the rest of the expression
+        elif ls[0] == 'profile' and len(ls) > 1:
+            if self.profile is None:
+                self.start_profile()
+            del ls[0]
+            self.silent = False
+            return False
         # list all variables
         elif ls[0] == 'list':
             vrs = [str(v) for v in self.vars.values() if v.kind == 'var']
@@ -226,10 +312,15 @@ class Calculator:
             if '__arg_sep__' in fns:
                 fns.append(self.config['expression']['argument_separator'])
             fns = [v for v in fns if not v.startswith((' ', '__'))]
+            pfx = [
+                f"{unit} ({', '.join(prefixes)})"
+                for unit, prefixes in self.prefixes.items()
+            ]
             cmp = [f'{self.completion[c]} {c}' for c in self.completion]
             self.assign_ans(
                 '\nFUNCTIONS:\n' + '  '.join(fns)
                 + '\n\nVARIABLES:\n' + '  '.join(vrs)
+                + '\n\nPREFIXED UNITS:\n' + '  '.join(pfx)
                 + '\n\nMAPPINGS:\n' + '  '.join(cmp)
             )
             self.silent = False
@@ -243,8 +334,8 @@ class Calculator:
                 )
             if len(ls) == 1:
                 ans += self.helptext
-            if len(ls) > 1 and arg in self.vars:
-                ans += self.vars[arg].get_help()
+            if len(ls) > 1 and self.resolve(arg) is not None:
+                ans += self.resolve(arg).get_help()
             if len(ls) > 1 and ' ' + arg in self.vars:
                 if self.vars[' ' + arg].closes != arg:
                     ans += self.vars[' ' + arg].get_help()
@@ -260,8 +351,42 @@ class Calculator:
         self.silent = False
         return False
 
+    def user_variables(self):
+        """Return a dictionary of the variables assigned by the user."""
+        return {
+            name: token.calc() for name, token in self.vars.items()
+            if token.kind == 'var' and not name.startswith('__')
+            and self.builtin.get(name) is not token
+        }
+
+    def save_session(self, name):
+        """Save the user variables and return their number."""
+        return session.save(name, self.user_variables(), self.definitions)
+
+    def load_session(self, name):
+        """Restore saved user variables and return their number."""
+        variables, definitions = session.load(name)
+        for var, value in variables.items():
+            self.unbind(var)
+            self.assign_ans(value, link=var)
+        for var, (ls, reads) in definitions.items():
+            self.definitions[var] = (ls, reads)
+            for word in reads:
+                self.dependents.setdefault(word, set()).add(var)
+        return len(variables)
+
     def perform_assignment(self, ls):
         """Change the assignment link according to a list of strings."""
+        self.binding = False
+        # reactive binding (x := 2y)
+        if len(ls) > 3 and \
+                ls[1] + ls[2] == self.config['system']['binding_oper']:
+            name = ls[0]
+            if name in self.vars and self.vars[name].kind != 'var':
+                raise Calculator.CompilationError('assignment error')
+            self.link = name
+            self.binding = True
+            return ls[3:]
         # simple assignment (x = 1)
         if len(ls) > 2 and ls[1] == self.config['system']['assignment_oper']:
             name = ls[0]
@@ -279,31 +404,107 @@ class Calculator:
         self.link = self.config['expression']['answer_name']
         return ls
 
+    def split_conversion(self, ls):
+        """Split a list of strings at the conversion operator.
+
+        Returns the expression and the target unit (None if absent).
+        """
+        level = 0
+        for i, word in enumerate(ls):
+            if word in self.config['system']['opening_braces']:
+                level += 1
+            elif word in self.config['system']['closing_braces']:
+                level -= 1
+            elif level == 0 and word == self.config['system']['conv_oper']:
+                if i == 0 or i == len(ls) - 1:
+                    raise Calculator.CompilationError('conversion error')
+                return ls[:i], ls[i+1:]
+        return ls, None
+
+    def get_unit_table(self):
+        """Return the units defined by modules as {dimension: {name: q}}.
+
+        The table is built once (on first use) from the module variables
+        that are quantities, so that looking up the units of a dimension
+        is a dictionary access.
+        """
+        if self.unit_table is None:
+            self.unit_table = dict()
+            for token in self.vars.values():
+                if token.module is None or token.kind != 'var':
+                    continue
+                value = token.calc()
+                if isinstance(value, Quantity):
+                    self.unit_table.setdefault(value.units, dict())
+                    self.unit_table[value.units][token.name] = value
+        return self.unit_table
+
+    def display_unit(self, units):
+        """Return the preferred (name, quantity) of a derived unit or None."""
+        if not self.config['view']['derived_units']:
+            return None
+        candidates = self.get_unit_table().get(units, dict())
+        for name in self.display_units:
+            if name in candidates:
+                return (name, candidates[name])
+        return None
+
+    def is_offset_unit(self, ls):
+        """Return whether a list of strings is a unit with an offset.
+
+        Units with an offset (like '°C') are signs giving quantities.
+        """
+        token = self.resolve(ls[0]) if len(ls) == 1 else None
+        if token is None or token.kind != 'sign' or token.arg_num != 1:
+            return False
+        try:
+            return isinstance(token.calc(Decimal(1)), Quantity)
+        except Exception:
+            return False
+
+    def convert(self, obj, ls):
+        """Convert obj to the unit described by a list of strings."""
+        if isinstance(obj, Array):
+            return Array(*[self.convert(el, ls) for el in obj])
+        if not isinstance(obj, Quantity):
+            raise Quantity.OperationError('conversion of a plain number')
+        # Insert spaces only between names (e.g. 'kg m/s^2')
+        name = ls[0]
+        for last, word in zip(ls, ls[1:]):
+            if self.isalphaplus(last[-1]) and self.isalphaplus(word[0]):
+                name += ' '
+            name += word
+        candidates = self.get_unit_table().get(obj.units, dict())
+        if len(ls) == 1 and ls[0] in candidates:
+            unit = candidates[ls[0]]
+        elif self.is_offset_unit(ls):
+            raise Quantity.OperationError('offset units cannot be converted')
+        else:
+            unit = self.evaluate(ls)
+        if not isinstance(unit, Quantity) or unit.units is not obj.units:
+            raise Quantity.OperationError('conversion to different units')
+        return Quantity(obj.value, obj.units, display=(name, unit.value))
+
     def tokenize(self, ls):
         """Transform a list of strings to a list of Token objects."""
         ans = []
         for word in ls:
             if word[0] == self.config['system']['quote']:
                 get = Token.give(word.strip(self.config['system']['quote']))
-                ans.append(Token(word, get, 'static', 'str'))
+                ans.append(Token(word, get, 'static', 'str', pure=True))
             elif '..' in word:
                 n1, n2 = word.split('..')
                 if n1:
-                    ans.append(
-                        Token(n1, Token.give(Decimal(n1)), 'static', 'num'),
-                    )
+                    ans.append(Token.constant(Decimal(n1), n1))
                 ans.append(self.vars['..'])
                 if n2:
-                    ans.append(
-                        Token(n2, Token.give(Decimal(n2)), 'static', 'num'),
-                    )
+                    ans.append(Token.constant(Decimal(n2), n2))
             elif word[0].isdigit() or word[0] == '.':
-                num = Decimal(word)
-                ans.append(Token(word, Token.give(num), 'static', 'num'))
+                ans.append(Token.constant(Decimal(word), word))
             elif word == self.config['expression']['argument_separator']:
                 ans.append(self.vars['__arg_sep__'])
-            elif word in self.vars:
-                ans.append(self.vars[word])
+            elif self.resolve(word) is not None:
+                ans.append(self.resolve(word))
             else:
                 ans.append(Token.wrap(
                     UnknownName(word),
@@ -420,8 +621,11 @@ class Calculator:
             print('postfix notation:  ', ans)
         return ans
 
-    def perform_operations(self, ls):
-        """Perform postfix notation operations."""
+    def perform_operations(self, ls, hooks=None):
+        """Perform postfix notation operations.
+
+        The calls of the tokens are reported to hooks (if given).
+        """
         data_stack = []
         for token in ls:
             if len(data_stack) < token.arg_num:
@@ -429,7 +633,11 @@ class Calculator:
             args = []
             for _ in range(token.arg_num):
                 args.insert(0, data_stack.pop())
-            ans = token.calc(*args)
+            BUDGET.call()
+            if hooks is None:
+                ans = token.calc(*args)
+            else:
+                ans = hooks.call(token, *args)
             if isinstance(ans, list):
                 data_stack += ans
             else:
@@ -442,8 +650,11 @@ class Calculator:
             return stack[0]
         raise Calculator.CompilationError('compilation error')
 
-    def perform_operations_twice(self, ls):
-        """Run perform_operations and test the answer."""
+    def check_answer(self, a, i):
+        """Return answer a tested against answer i (less precise).
+
+        Numbers that differ too much are rounding errors of zero.
+        """
         def test(a1, i1):
             if a1 == 0 or Decimal(0.5) < i1 / a1 < 2:
                 return a1
@@ -453,27 +664,65 @@ class Calculator:
             if isinstance(a1, str):
                 return a1
             if isinstance(a1, Quantity):
-                return Quantity(test(a1.value, i1.value), a1.units)
+                return Quantity(
+                    test(a1.value, i1.value), a1.units, display=a1.display
+                )
             return test(a1, i1)
 
-        a = self.perform_operations(ls)
-        a = self.require_one_answer(a)
-        decimal.getcontext().prec -= 5
-        i = self.perform_operations(ls)
-        i = self.require_one_answer(i)
-        decimal.getcontext().prec += 5
         if isinstance(a, ArgList):
-            new = ArgList()
+            ans = ArgList()
             for a2, i2 in zip(a, i):
-                ArgList.join(new, type_test(a2, i2))
-            ans = new
+                ArgList.join(ans, type_test(a2, i2))
         elif isinstance(a, Array):
-            new = Array()
+            ans = Array()
             for a2, i2 in zip(a, i):
-                Array.join(new, type_test(a2, i2))
-            ans = new
+                Array.join(ans, type_test(a2, i2))
         else:
             ans = type_test(a, i)
+        return ans
+
+    def fold(self, ls):
+        """Calculate a constant part of an expression (in postfix notation).
+
+        The part is calculated twice (like the whole expression); the calls
+        of the first pass are reported to the hooks.
+        """
+        hooks = self.hooks if self.hooks.active else None
+        a = self.require_one_answer(self.perform_operations(ls, hooks))
+        decimal.getcontext().prec -= 5
+        try:
+            i = self.require_one_answer(self.perform_operations(ls))
+        finally:
+            decimal.getcontext().prec += 5
+        return self.check_answer(a, i)
+
+    def optimize(self, ls):
+        """Fold constants and share repeated subexpressions (see optimizer)."""
+        ans = optimize(
+            ls, self.fold,
+            errors=CALCULATION_ERRORS + (Calculator.CompilationError,),
+        )
+        if self.config['global']['show_debug']:
+            print('optimized:         ', ans)
+        return ans
+
+    def perform_operations_twice(self, ls):
+        """Run perform_operations and test the answer."""
+        if self.hooks.active:
+            a = self.hooks.time(
+                'perform_operations', self.perform_operations,
+                ls, self.hooks
+            )
+        else:
+            a = self.perform_operations(ls)
+        a = self.require_one_answer(a)
+        decimal.getcontext().prec -= 5
+        try:
+            i = self.run_stage('second pass', self.perform_operations, ls)
+        finally:
+            decimal.getcontext().prec += 5
+        i = self.require_one_answer(i)
+        ans = self.check_answer(a, i)
         if self.config['global']['show_debug']:
             print('answer:            ', ans)
             print()
@@ -491,9 +740,25 @@ class Calculator:
         elif isinstance(obj, Decimal):
             notation = self.config['number']['notation']
             ans = decimal_to_string(obj, notation=notation)
+        elif isinstance(obj, Quantity):
+            notation = self.config['number']['notation']
+            display = obj.display
+            if display is None:
+                unit = self.display_unit(obj.units)
+                if unit is not None:
+                    display = (unit[0], unit[1].value)
+            if display is None:
+                value, unit = obj.value, obj.unit_str()
+            else:
+                value, unit = obj.value / display[1], display[0]
+            ans = f'{decimal_to_string(value, notation=notation)} {unit}'
         else:
             ans = str(obj)
-        return ans.replace(
+        return self.replace_placeholders(ans)
+
+    def replace_placeholders(self, string):
+        """Replace the separator placeholders with configured symbols."""
+        return string.replace(
             '__arg_sep__',
             self.config['expression']['argument_separator']
         ).replace(
@@ -501,26 +766,296 @@ class Calculator:
             self.config['number']['decimal_separators'][0]
         )
 
-    def calculate(self, expr):
-        """Calculate expression exp and store the answer."""
+    def object_to_chunks(self, obj, limit=None):
+        """Represent obj as a sequence of strings (arrays are streamed).
+
+        Arrays longer than 2 * limit are summarized (if limit is given).
+        """
+        if isinstance(obj, (Array, ArgList)):
+            for chunk in obj.stream(limit):
+                yield self.replace_placeholders(chunk)
+        else:
+            yield self.object_to_string(obj)
+
+    def write_answer(self, file, prefix='', summarize=False):
+        """Write prefix and the answer of the current expression to file.
+
+        Long arrays are summarized if summarize is True and the answer is
+        not requested in full (with the 'full' command).
+        Returns False (and writes nothing) if there is no answer to write.
+        """
+        if self.err:
+            return False
+        ans = self.vars['__ans__'].calc()
+        if ans is None:
+            return False
+        limit = None
+        if summarize and not self.full_output:
+            limit = self.config['view']['array_limit'] or None
+            if limit is not None and limit < 0:
+                limit = None
+        file.write(prefix)
+        for chunk in self.object_to_chunks(ans, limit):
+            file.write(chunk)
+        return True
+
+    def add_hook(self, event, callback):
+        """Call callback(payload) on every event (see clic.hooks).
+
+        Events: 'stage_start', 'stage_end', 'token_call', 'error'.
+        """
+        self.hooks.add(event, callback)
+
+    def remove_hook(self, event, callback):
+        """Stop calling callback on event."""
+        self.hooks.remove(event, callback)
+
+    def run_stage(self, name, function, *args):
+        """Return function(*args), reported to the hooks as stage name."""
+        if self.hooks.active:
+            return self.hooks.time(name, function, *args)
+        return function(*args)
+
+    def start_profile(self):
+        """Start profiling the current calculation."""
+        self.profile = Profile()
+        self.profile.attach(self.hooks)
+
+    def variables_read(self, ls):
+        """Return the set of variables used in an expression."""
+        answer_name = self.config['expression']['answer_name']
+        return {
+            word for word in ls
+            if word in self.vars and self.vars[word].kind == 'var'
+            and word != answer_name
+        }
+
+    def find_dependents(self, name):
+        """Return the definitions depending on name in topological order.
+
+        Every definition comes after all the definitions it reads.
+        """
+        order = []
+        visited = set()
+        stack = [(name, iter(self.dependents.get(name, ())))]
+        while stack:
+            node, children = stack[-1]
+            for child in children:
+                if child not in visited:
+                    visited.add(child)
+                    stack.append(
+                        (child, iter(self.dependents.get(child, ())))
+                    )
+                    break
+            else:
+                stack.pop()
+                if node != name:
+                    order.append(node)
+        order.reverse()
+        return order
+
+    def bind(self, name, ls):
+        """Make name a reactive variable defined by an expression."""
+        reads = self.variables_read(ls)
+        if name in reads or reads.intersection(self.find_dependents(name)):
+            raise Calculator.CompilationError('circular definition')
+        self.unbind(name)
+        self.definitions[name] = (ls, reads)
+        for word in reads:
+            self.dependents.setdefault(word, set()).add(name)
+
+    def unbind(self, name):
+        """Make name a static variable (if it is reactive)."""
+        if name not in self.definitions:
+            return
+        _, reads = self.definitions.pop(name)
+        for word in reads:
+            self.dependents[word].discard(name)
+
+    def save_variables(self):
+        """Return a copy of the variables and the reactive definitions."""
+        dependents = {
+            name: set(names) for name, names in self.dependents.items()
+        }
+        return dict(self.vars), dict(self.definitions), dependents
+
+    def restore_variables(self, saved):
+        """Restore the variables saved by save_variables."""
+        variables, self.definitions, self.dependents = saved
+        self.vars.clear()
+        self.vars.update(variables)
+
+    def update_dependents(self, name):
+        """Recalculate the reactive variables depending on name."""
+        if not self.dependents.get(name):
+            return
+        for dependent in self.find_dependents(name):
+            ls, _ = self.definitions[dependent]
+            self.assign_ans(self.evaluate_expression(ls), link=dependent)
+
+    def evaluate_expression(self, ls):
+        """Evaluate an expression, converting it if it has a target unit."""
+        ls, target = self.split_conversion(ls)
+        ans = self.evaluate(ls)
+        if target is not None:
+            ans = self.run_stage('convert', self.convert, ans, target)
+        return ans
+
+    def compile(self, ls):
+        """Transform an expression given as a list of strings to postfix."""
+        ls = self.run_stage('tokenize', self.tokenize, ls)
+        ls = self.run_stage(
+            'complete_infix_notation', self.complete_infix_notation, ls
+        )
+        return self.run_stage(
+            'shunting_yard_algorithm', self.shunting_yard_algorithm, ls
+        )
+
+    def execute(self, ls):
+        """Calculate an expression given as a list of tokens in postfix."""
+        ls = self.run_stage('optimize', self.optimize, ls)
+        return self.perform_operations_twice(ls)
+
+    def evaluate(self, ls):
+        """Evaluate an expression given as a list of strings."""
+        return self.execute(self.compile(ls))
+
+    def pack(self, ls):
+        """Return a postfix list of tokens as a tuple of (tag, text) pairs.
+
+        Tokens are stored by name, so the packed expression uses the values
+        of the variables at the time it is unpacked.
+        """
+        ans = []
+        for token in ls:
+            if token.kind == 'num':
+                ans.append(('n', token.name))
+            elif token.kind == 'str':
+                ans.append(('s', token.name))
+            elif token.kind == 'var' \
+                    and isinstance(token.calc(), UnknownName):
+                ans.append(('u', token.calc().name))
+            else:
+                ans.append(('t', token.name))
+        return tuple(ans)
+
+    def unpack(self, packed):
+        """Return the postfix list of tokens of a packed expression.
+
+        Returns None if a token no longer exists.
+        """
+        ans = []
+        for tag, text in packed:
+            if tag == 'n':
+                ans.append(Token.constant(Decimal(text), text))
+            elif tag == 's':
+                get = Token.give(text.strip(self.config['system']['quote']))
+                ans.append(Token(text, get, 'static', 'str', pure=True))
+            elif tag == 'u':
+                ans.append(self.resolve(text) or Token.wrap(
+                    UnknownName(text),
+                    name=f'<?{text}?>'
+                ))
+            else:
+                token = self.resolve(text)
+                if token is None:
+                    return None
+                ans.append(token)
+        return ans
+
+    def token_table_version(self):
+        """Return a string identifying the tokens and the syntax config.
+
+        Packed expressions are valid only for the same version.
+        """
+        data = [
+            (name, token.kind, token.arg_num, token.pref, token.ltor)
+            for name, token in sorted(self.builtin.items())
+        ]
+        data.append([name for name, _ in self.resolvers])
+        for section in ('number', 'expression', 'system'):
+            data.append(sorted(self.config[section].items()))
+        return hashlib.sha1(repr(data).encode()).hexdigest()
+
+    def calculate(self, expr, compiled=None):
+        """Calculate expression exp and store the answer.
+
+        The calculation is profiled if it starts with the 'profile'
+        command or if global.profile is set in the config.
+
+        Arguments:
+        expr -- the expression (a string),
+        compiled -- a list of (list of strings, packed postfix or None)
+          pairs for the expressions of expr (optional, see pack); the
+          split and the compilation of packed expressions are skipped.
+
+        Returns a list of (list of strings, postfix or None) pairs of the
+        calculated expressions (postfix is None for commands).
+        """
+        done = []
+        self.full_output = False
+        self.profile = None
+        self.hooks.stage = None
+        if self.config['global']['profile']:
+            self.start_profile()
         try:
-            for exp in self.split(expr):
+            limits = self.config['budget']
+            BUDGET.start(limits['calls'], limits['array_length'],
+                         limits['digits'], limits['time'])
+            start = time.perf_counter()
+            if compiled is None:
+                expressions = self.run_stage('split', self.split, expr)
+                compiled = [(exp, None) for exp in expressions]
+            split_time = time.perf_counter() - start
+            for exp, packed in compiled:
+                words = list(exp)
+                exp = list(exp)
                 if self.run_command(exp):
+                    done.append((words, None))
                     continue
+                # The 'profile' command starts profiling after the split
+                if self.profile is not None \
+                        and 'split' not in self.profile.stages:
+                    self.profile.add('split', split_time)
                 exp = self.perform_assignment(exp)
-                exp = self.tokenize(exp)
-                exp = self.complete_infix_notation(exp)
-                exp = self.shunting_yard_algorithm(exp)
-                exp = self.perform_operations_twice(exp)
-                self.assign_ans(exp)
-                self.assign_ans(exp, link=self.link)
+                ls, target = self.split_conversion(exp)
+                postfix = None if packed is None else self.unpack(packed)
+                if postfix is None:
+                    postfix = self.compile(ls)
+                done.append((words, postfix))
+                ans = self.execute(postfix)
+                if target is not None:
+                    ans = self.run_stage('convert', self.convert, ans, target)
+                # The variable and its dependents change all or none
+                saved = self.save_variables()
+                try:
+                    if self.binding:
+                        self.bind(self.link, exp)
+                    else:
+                        self.unbind(self.link)
+                    self.assign_ans(ans, link=self.link)
+                    self.update_dependents(self.link)
+                except Exception:
+                    self.restore_variables(saved)
+                    raise
+                self.assign_ans(ans)
                 self.err = None
         except Exception as err:
             self.err = err
+            if self.hooks.active:
+                self.hooks.error(err)
+        finally:
+            if self.profile is not None:
+                self.profile.detach(self.hooks)
+        return done
 
-    def get_answer(self):
+    def get_answer(self, fmt=None):
         """Return the answer of the current expression.
 
+        Arguments:
+        fmt -- a machine-readable output format: 'json', 'csv' or 'raw'
+          (optional, by default the answer is formatted for humans).
+
         Returns:
         flag -- is the output an error,
         output -- the error / answer (as a string).
@@ -532,7 +1067,12 @@ class Calculator:
         ans = self.vars['__ans__'].calc()
         if ans is None:
             return (True, '')
-        ans = self.object_to_string(ans)
+        if fmt is None:
+            ans = self.object_to_string(ans)
+        elif fmt in FORMATS:
+            ans = FORMATS[fmt](ans)
+        else:
+            return (True, f"unknown output format: '{fmt}'")
         return (False, ans)
 
 
@@ -7,6 +7,11 @@ It runs the calculator with a prompt.
 
 from clic.calculator import Calculator
 from clic.config import CONFIG
+from clic.session import SessionError
+from clic import script
+import atexit
+import bisect
+import json
 import sys
 
 CONFIG['system']['help_text'] = '''
@@ -14,45 +19,88 @@ CONFIG['system']['help_text'] = '''
 | exit -- exit the calculator                |
 | help -- display this help                  |
 | list -- list available functions & units   |
+| full -- show the whole (long) last answer  |
+| profile <EXPR> -- time the calculation     |
+| save/restore <NAME> -- keep variables      |
 | help <NAME> -- help on a specific function |
 '~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~'''
 
 
-def overlap(a, b):
-    # print(a, b)
-    for i in range(0, len(a)):
-        if b.startswith(a[-i-1:]):
-            return i
-    return 0
-
-
-def create_completer(bindings, vocab):
-    vocab = [word for word in vocab if ' ' not in word]
-    bindlist = list(bindings)
-    bindlist.sort(key=len, reverse=False)
-    bindlist_reverse = list(bindings)
-    bindlist_reverse.sort(key=len, reverse=True)
-
-    def completer(text, state):
+# The commands of the prompt (completed like the names)
+COMMANDS = ('exit', 'full', 'help', 'list', 'profile', 'restore', 'save')
+
+
+class Completer:
+    """Readline completer with mappings and names kept in sorted lists.
+
+    Completes (cycling through the candidates on each call):
+    - '\\<start of a mapping>' to the mapped symbol ('\\alp' -> 'α'),
+    - text ending with a whole mapping to the symbol ('2deg' -> '2°'),
+    - the start of a name to the name ('sq' -> 'sqrt ').
+    """
+
+    def __init__(self, bindings, vocab):
+        """The initialiser of the class."""
+        self.bindings = bindings
+        self.keys = sorted(bindings)
+        self.longest = max(map(len, bindings), default=0)
+        self.vocab = []
+        self.known = set()
+        self.matches = []
+        self.add(vocab)
+
+    def add(self, words):
+        """Add new names to the completion vocabulary."""
+        new = {word for word in words if ' ' not in word} - self.known
+        if not new:
+            return
+        self.known |= new
+        if len(new) > 1:
+            self.vocab = sorted(self.known)
+        else:
+            bisect.insort(self.vocab, new.pop())
+
+    @staticmethod
+    def starting_with(words, prefix):
+        """Return the words of a sorted list that start with prefix."""
+        ans = []
+        for i in range(bisect.bisect_left(words, prefix), len(words)):
+            if not words[i].startswith(prefix):
+                break
+            ans.append(words[i])
+        return ans
+
+    def find_matches(self, text):
+        """Return all completions of text."""
         # With backslash
-        for word in bindlist:
-            if overlap(text[-len(bindlist_reverse[0]):], '\\' + word):
-                start = '\\'.join(text.split('\\')[:-1])
-                return [start + bindings[word]][state]
-        # Without backslash
-        for word in bindlist_reverse:
-            # if text == word:
-            #     return [bindings[word]][state]
-            if text.endswith(word):
-                return text[:-len(word)] + [bindings[word]][state]
+        if '\\' in text:
+            start, part = text.rsplit('\\', 1)
+            if part:
+                keys = self.starting_with(self.keys, part)
+                keys.sort(key=len)
+                return [start + self.bindings[key] for key in keys]
+        # Without backslash (the longest mapping the text ends with)
+        for size in range(min(self.longest, len(text)), 0, -1):
+            if text[-size:] in self.bindings:
+                return [text[:-size] + self.bindings[text[-size:]]]
         # Variable completion
-        if state == 0 and len(text) > 0:
-            matches = [c for c in vocab if c.startswith(text)]
-            if len(matches) == 1:
-                return matches[0] + " "
+        if text:
+            return [word + ' ' for word in self.starting_with(
+                self.vocab, text
+            )]
+        return []
+
+    def __call__(self, text, state):
+        """Return the completion number state of text (or None)."""
+        if state == 0:
+            self.matches = self.find_matches(text)
+        if state < len(self.matches):
+            return self.matches[state]
         return None
 
-    return completer
+
+def create_completer(bindings, vocab):
+    return Completer(bindings, vocab)
 
 
 PROMPT = f'\033[{CONFIG["view"]["prompt_color"]}mclic:\033[0m '
@@ -64,6 +112,15 @@ def create_calculator():
     return Calculator(config=CONFIG)
 
 
+def start_autosave(ctor):
+    """Restore the autosaved session and save it again on exit."""
+    try:
+        ctor.load_session('autosave')
+    except SessionError:
+        pass
+    atexit.register(ctor.save_session, 'autosave')
+
+
 def single_prompt(ctor):
     """A nice single line one-time prompt."""
     try:
@@ -73,38 +130,73 @@ def single_prompt(ctor):
         print(LINE_UP, end=LINE_CLEAR)
         sys.exit()
     ctor.calculate(exp)
-    flag, ans = ctor.get_answer()
-    if flag:
-        print(f'! {ans}')
-    elif ctor.silent:
-        pass
-    else:
+    if ctor.err is None and not ctor.silent:
+        # Print the answer as it is rendered
+        prefix = '= '
         if CONFIG['view']['oneline']:
             if not CONFIG['global']['show_debug']:
                 print(LINE_UP, end=LINE_CLEAR)
-            print(f'{PROMPT}{exp} = {ans}')
-        else:
-            print(f'= {ans}')
+            prefix = f'{PROMPT}{exp} = '
+        if ctor.write_answer(sys.stdout, prefix, summarize=True):
+            print()
+            print_profile(ctor)
+            return ctor
+    flag, ans = ctor.get_answer()
+    if flag:
+        print(f'! {ans}')
+    print_profile(ctor)
     return ctor
 
 
+def print_profile(ctor, file=sys.stdout):
+    """Print the timing profile of the last calculation (if there is one)."""
+    if ctor.profile is not None:
+        print(ctor.profile.report(), file=file)
+
+
 def command_line_calc():
     """Calculate using command line arguments."""
-    if sys.argv[1] == '--help':
+    args = sys.argv[1:]
+    if args[0] == '--help':
         print('CLIC command-line calculator')
-        print('Usage:  clic [--help,--version] [expression]')
+        print('Usage:  clic [--help,--version] [--format json|csv|raw] '
+              '[expression]')
+        print('        clic run <file>  (calculate the lines of a file)')
         sys.exit()
-    elif sys.argv[1] == '--version':
+    elif args[0] == '--version':
         print('clic 1')
         sys.exit()
+    elif args[0] == 'run' and len(args) == 2:
+        try:
+            errors = script.run(Calculator(), args[1])
+        except OSError as err:
+            print(f'cannot read {args[1]}: {err.strerror}', file=sys.stderr)
+            sys.exit(1)
+        sys.exit(1 if errors else 0)
+    fmt = None
+    if args[0] == '--format':
+        if len(args) < 2:
+            print('--format requires json, csv or raw', file=sys.stderr)
+            sys.exit(1)
+        fmt, args = args[1], args[2:]
     ctor = Calculator()
-    ctor.calculate(' '.join(sys.argv[1:]))
-    flag, ans = ctor.get_answer()
+    ctor.calculate(' '.join(args))
+    # The profile is not a part of the (possibly machine-read) answer
+    print_profile(ctor, file=sys.stderr)
+    if fmt is None and not ctor.silent and ctor.write_answer(sys.stdout):
+        print()
+        return
+    flag, ans = ctor.get_answer(fmt)
+    if flag and not ans:
+        # An empty answer is not an error
+        return
+    if flag and fmt == 'json':
+        print(json.dumps({'error': ans}, ensure_ascii=False))
+        sys.exit(1)
     if flag:
         print(ans, file=sys.stderr)
-    elif ctor.silent:
-        pass
-    else:
+        sys.exit(1)
+    if not ctor.silent:
         print(ans)
 
 
@@ -113,20 +205,26 @@ def app():
         command_line_calc()
     else:
         ctor = create_calculator()
+        if CONFIG['global']['autosave']:
+            start_autosave(ctor)
         # impove standard UX
         import readline
-        readline.parse_and_bind('tab: complete')
+        # Cycle through the completions on each press of tab
+        readline.parse_and_bind('tab: menu-complete')
         # readline.set_completer_delims(
         #     '0123456789!@#$%^&*()-+=`~\'"<,.>/?:;| '
         # )
         readline.set_completer_delims(' ')
-        readline.set_completer(create_completer(
+        completer = create_completer(
             ctor.completion,
-            ctor.vars | {'help': 'help', 'exit': 'exit', 'list': 'list'}
-        ))
+            ctor.vars | dict.fromkeys(COMMANDS)
+        )
+        readline.set_completer(completer)
         if CONFIG['view']['loop']:
             while True:
                 single_prompt(ctor)
+                # Complete newly assigned variables
+                completer.add(ctor.vars)
         else:
             single_prompt(ctor)
 
@@ -23,6 +23,8 @@ else:
 system_config = {
     'quote': '"',
     'assignment_oper': '=',
+    'binding_oper': ':=',
+    'conv_oper': 'to',
     'alphabet_extra': '_μΔ°',
     'opening_braces': '([{',
     'closing_braces': '}])',
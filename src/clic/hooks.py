@@ -0,0 +1,96 @@
+"""This module provides event hooks for observing calculations.
+
+Callbacks can be registered for the following events:
+- stage_start -- a stage of the pipeline (e.g. 'tokenize') begins,
+- stage_end -- a stage of the pipeline ends,
+- token_call -- a token is calculated (during the first evaluation pass),
+- error -- a calculation fails.
+
+Each callback is called with a dictionary describing the event:
+- event -- the name of the event,
+- name -- the name of the stage / token / error type,
+- time -- the time of the event (seconds since the epoch),
+- duration -- the time spent in the stage / token (seconds, end events),
+- size -- the number of elements (strings, tokens, array elements) of the
+  input (stage_start) or output (stage_end, token_call) of the stage,
+- error -- the exception (error events),
+- stage -- the stage in which the error occured (error events).
+"""
+
+import time
+
+from clic.mathclasses import ArgList, Array
+
+EVENTS = ('stage_start', 'stage_end', 'token_call', 'error')
+
+
+def payload_size(obj):
+    """Return the number of elements of obj (1 for single values)."""
+    if isinstance(obj, (list, tuple, str, Array, ArgList)):
+        return len(obj)
+    return 1
+
+
+class Hooks:
+    """The Hooks object stores callbacks and reports events to them."""
+
+    def __init__(self):
+        """The initialiser of the class."""
+        self.callbacks = {event: [] for event in EVENTS}
+        self.active = False
+        self.stage = None
+
+    def add(self, event, callback):
+        """Register callback for event."""
+        if event not in self.callbacks:
+            raise ValueError(f"unknown event: '{event}'")
+        self.callbacks[event].append(callback)
+        self.active = True
+
+    def remove(self, event, callback):
+        """Unregister callback for event."""
+        if event not in self.callbacks:
+            raise ValueError(f"unknown event: '{event}'")
+        if callback in self.callbacks[event]:
+            self.callbacks[event].remove(callback)
+        self.active = any(self.callbacks.values())
+
+    def emit(self, event, **payload):
+        """Call the callbacks of event with the payload."""
+        callbacks = self.callbacks[event]
+        if callbacks:
+            payload['event'] = event
+            for callback in callbacks:
+                callback(payload)
+
+    def time(self, name, function, *args):
+        """Return function(*args) reported as a stage called name."""
+        self.stage = name
+        size = payload_size(args[0]) if args else 0
+        self.emit('stage_start', name=name, time=time.time(), size=size)
+        start = time.perf_counter()
+        ans = function(*args)
+        duration = time.perf_counter() - start
+        self.emit(
+            'stage_end', name=name, time=time.time(),
+            duration=duration, size=payload_size(ans),
+        )
+        return ans
+
+    def call(self, token, *args):
+        """Return token.calc(*args) reported as a token call."""
+        start = time.perf_counter()
+        ans = token.calc(*args)
+        duration = time.perf_counter() - start
+        self.emit(
+            'token_call', name=token.name, time=time.time(),
+            duration=duration, size=payload_size(ans),
+        )
+        return ans
+
+    def error(self, err):
+        """Report an error."""
+        self.emit(
+            'error', name=type(err).__name__, time=time.time(),
+            error=err, stage=self.stage,
+        )
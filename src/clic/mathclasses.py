@@ -1,8 +1,15 @@
 """This module provides mathematical classes for fixed-point calculations."""
 
 from decimal import Decimal
+from fractions import Fraction
+from itertools import zip_longest
 import decimal
+from functools import partial
 from math import asin, acos, atan
+import time
+
+from clic.budget import BUDGET
+from clic.parallel import MIN_TIME, SAMPLE_SIZE, map_chunks
 
 
 glob_pi = Decimal('3.1415926535897932384626433833')
@@ -17,13 +24,16 @@ def normalize_fraction(d):
     return a
 
 
+# Bounds of the engineering notation range of the classic notation
+classic_min = Decimal('5e-10')
+classic_max = Decimal('5e12')
+
+
 def decimal_to_string(x, notation='classic'):
     """Return a string representation of decimal x."""
     y = x.adjusted()
     if notation == 'classic':
-        if Decimal('5e-10') < x < Decimal('5e12'):
-            y = y // 3 * 3
-        if Decimal('-5e-10') > x > Decimal('-5e12'):
+        if classic_min < abs(x) < classic_max:
             y = y // 3 * 3
     elif notation == 'engineering':
         y = y // 3 * 3
@@ -35,12 +45,99 @@ def decimal_to_string(x, notation='classic'):
         raise ValueError('invalid notation')
     if y == 0:
         return f'{normalize_fraction(x)}'
-    a = x / Decimal(10) ** y
+    a = x.scaleb(-y)
     if a == 1:
         return f'10^{y}'
     return f'{normalize_fraction(a)} * 10^{y}'
 
 
+def rational_exponent(x, max_denominator=12):
+    """Return x as a fraction with a small denominator (or None).
+
+    Exponents like 1:3 arrive as rounded decimals (0.333...), so a value is
+    accepted as p/q if q*x is an integer up to the last few context digits.
+    """
+    if not x.is_finite():
+        return None
+    exact = Fraction(x)
+    if exact.denominator <= max_denominator:
+        return exact
+    tolerance = Decimal(10) ** (3 - decimal.getcontext().prec)
+    for q in range(3, max_denominator + 1):
+        p = (x * q).to_integral_value()
+        if abs(x * q - p) <= tolerance * max(1, abs(p)):
+            return Fraction(int(p), q)
+    return None
+
+
+def integer_power(x, n):
+    """Return x to the integer power n (exact binary exponentiation)."""
+    if n < 0:
+        return Decimal(1) / integer_power(x, -n)
+    if not x or x != x.to_integral_value() \
+            or (x.adjusted() + 1) * n > 4 * decimal.getcontext().prec:
+        # Decimal already squares-and-multiplies, rounding only once
+        # (and raises InvalidOperation for 0^0)
+        return x ** n
+    base, ans = int(x), 1
+    while n:
+        if n & 1:
+            ans *= base
+        base *= base
+        n >>= 1
+    return +Decimal(ans)
+
+
+def nth_root(x, n):
+    """Return the real n-th root of x using Newton's method."""
+    if n == 2:
+        return x.sqrt()
+    if x == 0:
+        return Decimal(0)
+    if x < 0:
+        if n % 2 == 0:
+            raise ValueError('even root of negative number')
+        return -nth_root(-x, n)
+    prec = decimal.getcontext().prec
+    with decimal.localcontext() as ctx:
+        ctx.prec = prec + 5
+        # Start from a float guess of the rescaled number (no overflow)
+        k = x.adjusted() // n
+        y = Decimal(float(x.scaleb(-k * n)) ** (1 / n)).scaleb(k)
+        for _ in range(100):
+            z = ((n - 1) * y + x / y ** (n - 1)) / n
+            if abs(z - y) <= abs(z).scaleb(-prec - 2):
+                break
+            y = z
+    return +z
+
+
+def power(a, b):
+    """Exponentiation with fast paths for common exponents.
+
+    Integer exponents, square roots, powers of e and small rational
+    exponents avoid the general Decimal logarithm-based algorithm.
+    """
+    if not isinstance(a, (int, Decimal)) or not isinstance(b, (int, Decimal)):
+        return a ** b
+    a, b = Decimal(a), Decimal(b)
+    if not b.is_finite():
+        return a ** b
+    if a == glob_e:
+        return b.exp()
+    if b == b.to_integral_value():
+        return integer_power(a, int(b))
+    if b == Decimal('0.5'):
+        return a.sqrt()
+    ratio = rational_exponent(b)
+    if ratio is None:
+        return a ** b
+    with decimal.localcontext() as ctx:
+        ctx.prec += 5
+        ans = integer_power(nth_root(a, ratio.denominator), ratio.numerator)
+    return +ans
+
+
 class Multiset:
     """The creation of the Multiset object and the related functionality."""
 
@@ -106,6 +203,103 @@ class Multiset:
         return self.data == other.data
 
 
+class Dimension:
+    """An interned vector of the powers of base units.
+
+    There is only one Dimension object for every combination of powers,
+    so dimensions are compared by identity, and arithmetic on them adds
+    or scales the tuples of powers. Unit names that are not in base_units
+    are appended to it the first time they are used.
+    """
+
+    __slots__ = ('powers',)
+
+    base_units = ['kg', 'm', 's', 'A', 'K', 'mol', 'rad']
+    base_index = {unit: i for i, unit in enumerate(base_units)}
+    interned = dict()
+
+    def __new__(cls, powers=()):
+        """Return the dimension with the given tuple of powers."""
+        powers = list(powers)
+        while powers and not powers[-1]:
+            powers.pop()
+        powers = tuple(
+            int(p) if isinstance(p, Fraction) and p.denominator == 1 else p
+            for p in powers
+        )
+        if powers not in cls.interned:
+            dimension = super().__new__(cls)
+            dimension.powers = powers
+            cls.interned[powers] = dimension
+        return cls.interned[powers]
+
+    def __reduce__(self):
+        """Unpickle dimensions through the interned table."""
+        return (Dimension, (self.powers,))
+
+    def __copy__(self):
+        """Dimensions are interned, so copies are the same object."""
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    @classmethod
+    def from_dict(cls, units):
+        """Return the dimension of a dictionary {unit: power}."""
+        powers = [0] * len(cls.base_units)
+        for unit, power in units.items():
+            if unit not in cls.base_index:
+                cls.base_index[unit] = len(cls.base_units)
+                cls.base_units.append(unit)
+                powers.append(0)
+            powers[cls.base_index[unit]] += power
+        return cls(powers)
+
+    def __iter__(self):
+        """Return an iterator over the units present in the dimension."""
+        return (
+            Dimension.base_units[i]
+            for i, power in enumerate(self.powers) if power
+        )
+
+    def __bool__(self):
+        """Return True if the dimension is not dimensionless."""
+        return bool(self.powers)
+
+    def get(self, unit):
+        """Return the power of the unit."""
+        i = Dimension.base_index.get(unit, len(self.powers))
+        if i < len(self.powers):
+            return self.powers[i]
+        return 0
+
+    def __add__(self, other):
+        """Multiplication of units (addition of powers)."""
+        return Dimension(
+            a + b for a, b in zip_longest(self.powers, other.powers,
+                                          fillvalue=0)
+        )
+
+    def __sub__(self, other):
+        """Division of units (subtraction of powers)."""
+        return Dimension(
+            a - b for a, b in zip_longest(self.powers, other.powers,
+                                          fillvalue=0)
+        )
+
+    def __mul__(self, n):
+        """Exponentiation of units (multiplication of powers)."""
+        return Dimension(power * n for power in self.powers)
+
+    def __neg__(self):
+        """Reciprocal of units."""
+        return Dimension(-power for power in self.powers)
+
+    def __repr__(self):
+        return f'Dimension({self.powers})'
+
+
 class Quantity:
     """The Quantity object stores physical quantities."""
 
@@ -113,17 +307,23 @@ class Quantity:
         """An operation error class for quantities."""
         pass
 
-    def __init__(self, value, units):
+    def __init__(self, value, units, display=None):
         """The initialiser for the class.
 
         Arguments:
         value -- a number representing the numeric value of a quantity,
-        units -- a dictionary that matches units and their powers.
+        units -- a dictionary that matches units and their powers
+          (or a Dimension),
+        display -- a tuple (unit name, unit value) to show the quantity in
+          (optional, set by unit conversion).
         """
         if isinstance(units, dict):
-            units = Multiset(units)
+            units = Dimension.from_dict(units)
+        elif isinstance(units, Multiset):
+            units = Dimension.from_dict(units.data)
         self.units = units
         self.value = value
+        self.display = display
 
     @classmethod
     def angle(cls, value, degree=False):
@@ -144,16 +344,17 @@ class Quantity:
         for unit in self.units:
             power = self.units.get(unit)
             ans += str(unit)
-            if power != 1:
+            if isinstance(power, Fraction) and power.denominator != 1:
+                # m^(1:2) (m^1/2 would read as (m^1)/2)
+                ans += f'^({power.numerator}:{power.denominator})'
+            elif power != 1:
                 ans += '^' + str(power)
             ans += '*'
         return ans[:-1]
 
     def getpow(self, unit):
         """Return the power in which unit is present in the quantity."""
-        if unit in self.units:
-            return self.units.get(unit)
-        return 0
+        return self.units.get(unit)
 
     def __mul__(self, other):
         """Multiplication of quantities."""
@@ -178,7 +379,7 @@ class Quantity:
     def __add__(self, other):
         """Addition of quantities."""
         if isinstance(other, Quantity):
-            if self.units == other.units:
+            if self.units is other.units:
                 return Quantity(self.value + other.value, self.units)
         raise Quantity.OperationError('addition of different units')
 
@@ -189,7 +390,7 @@ class Quantity:
     def __sub__(self, other):
         """Subtraction of quantities."""
         if isinstance(other, Quantity):
-            if self.units == other.units:
+            if self.units is other.units:
                 return Quantity(self.value - other.value, self.units)
         raise Quantity.OperationError('subtraction of different units')
 
@@ -212,7 +413,16 @@ class Quantity:
         """Exponentiation of quantities."""
         if not isinstance(n, (int, Decimal)):
             raise Quantity.OperationError('raising to a (quantity) power')
-        return Quantity(self.value ** n, self.units * n)
+        ratio = rational_exponent(Decimal(n))
+        if ratio is None:
+            units = self.units * n
+        else:
+            # Keep unit powers exact (m^3 ^ 1:3 is m, not m^0.999...)
+            units = self.units * ratio
+        value = power(self.value, n)
+        if units:
+            return Quantity(value, units)
+        return value
 
     def __repr__(self):
         """String representation of quantities with additional info."""
@@ -222,15 +432,18 @@ class Quantity:
 
     def __str__(self):
         """String representation of quantities without additional info."""
+        if self.display is not None:
+            name, unit = self.display
+            return f'{decimal_to_string(self.value / unit)} {name}'
         return f'{decimal_to_string(self.value)} {self.unit_str()}'
 
-    def isangle(self, radians=Multiset({'rad': 1})):
+    def isangle(self, radians=Dimension.from_dict({'rad': 1})):
         """Return True if the quantity is an angle."""
-        return self.units == radians
+        return self.units is radians
 
-    def istemperature(self, kelvins=Multiset({'K': 1})):
-        """Return True if the quantity is an angle."""
-        return self.units == kelvins
+    def istemperature(self, kelvins=Dimension.from_dict({'K': 1})):
+        """Return True if the quantity is a temperature."""
+        return self.units is kelvins
 
     @staticmethod
     def cos(x):
@@ -243,6 +456,7 @@ class Quantity:
         decimal.getcontext().prec += 2
         i, lasts, s, fact, num, sign = 0, 0, 1, 1, 1, 1
         while s != lasts:
+            BUDGET.tick()
             lasts = s
             i += 2
             fact *= i * (i-1)
@@ -263,6 +477,7 @@ class Quantity:
         decimal.getcontext().prec += 2
         i, lasts, s, fact, num, sign = 1, 0, x, 1, x, 1
         while s != lasts:
+            BUDGET.tick()
             lasts = s
             i += 2
             fact *= i * (i-1)
@@ -330,6 +545,9 @@ class ArgList:
         """An operation error class for arglists."""
         pass
 
+    # Frozen arglists (e.g. stored in variables) are never changed
+    frozen = False
+
     def __init__(self, *args):
         """The initializer of the class.
 
@@ -346,6 +564,8 @@ class ArgList:
         >>> b = ArgList.join(a, 3)  # (1; 2; 3)
         """
         if isinstance(a, ArgList):
+            if a.frozen:
+                return ArgList(*a.ls, b)
             a.ls.append(b)
             return a
         return ArgList(a, b)
@@ -357,10 +577,13 @@ class ArgList:
         """Return an iterator over a arglist."""
         return self.ls.__iter__()
 
+    def stream(self, limit=None):
+        """Yield the string representation of the arglist in chunks."""
+        return stream_elements(self.ls, '(', ')', limit)
+
     def __repr__(self):
         """String representation of arglists."""
-        argument_separator = '__arg_sep__ '
-        return '(' + argument_separator.join([str(x) for x in self.ls]) + ')'
+        return ''.join(self.stream())
 
 
 class Array:
@@ -370,6 +593,9 @@ class Array:
         """An operation error class for arrays."""
         pass
 
+    # Frozen arrays (e.g. stored in variables) are never changed
+    frozen = False
+
     def __init__(self, *args):
         """The initialiser of the class.
 
@@ -386,6 +612,8 @@ class Array:
         >>> b = Array.join(a, 3)  # (1; 2; 3)
         """
         if isinstance(a, Array):
+            if a.frozen:
+                return Array(*a.ls, b)
             a.ls.append(b)
             return a
         return Array(a, b)
@@ -397,13 +625,16 @@ class Array:
         >>> Array.from_range(1, 5)  # (1; 2; 3; 4; 5)
         >>> Array.from_range(8, 6)  # (8; 7; 6)
         """
+        BUDGET.check_length(int(abs(b - a)) + 1)
         ans = Array()
         if a < b:
             while a <= b:
+                BUDGET.tick()
                 Array.join(ans, a)
                 a += 1
         else:
             while a >= b:
+                BUDGET.tick()
                 Array.join(ans, a)
                 a -= 1
         return ans
@@ -493,19 +724,19 @@ class Array:
             if len(other.ls) == len(self.ls):
                 ans = Array()
                 for a, b in zip(self.ls, other.ls):
-                    Array.join(ans, a ** b)
+                    Array.join(ans, power(a, b))
                 return ans
             raise Array.OperationError('exponentiation of different sizes')
         ans = Array()
         for a in self.ls:
-            Array.join(ans, a ** other)
+            Array.join(ans, power(a, other))
         return ans
 
     def __rpow__(self, other):
         """Exponentiation of arrays."""
         ans = Array()
         for a in self.ls:
-            Array.join(ans, other ** a)
+            Array.join(ans, power(other, a))
         return ans
 
     def __rtruediv__(self, other):
@@ -547,24 +778,93 @@ class Array:
 
     def __abs__(self):
         """Return the euclidean norm of the array."""
-        return (self.dot_product(self)) ** Decimal('0.5')
+        return power(self.dot_product(self), Decimal('0.5'))
 
     def __iter__(self):
         """Return an iterator over a array."""
         return self.ls.__iter__()
 
+    def stream(self, limit=None):
+        """Yield the string representation of the array in chunks."""
+        return stream_elements(self.ls, '[', ']', limit)
+
     def __repr__(self):
         """String representation of arrays."""
-        argument_separator = '__arg_sep__ '
-        return '[' + argument_separator.join([str(x) for x in self.ls]) + ']'
+        return ''.join(self.stream())
 
 
-def generalize_array_input(function):
+def stream_elements(ls, opening, closing, limit=None, batch=1000):
+    """Yield the string representation of a list of elements in chunks.
+
+    If limit is given and there are more than 2 * limit elements, only the
+    first and the last limit elements are shown, followed by the count.
+    """
+    argument_separator = '__arg_sep__ '
+    n = len(ls)
+    if limit is None or n <= 2 * limit:
+        parts = [ls]
+    else:
+        parts = [ls[:limit], ls[-limit:]]
+    yield opening
+    for i, part in enumerate(parts):
+        if i > 0:
+            yield argument_separator + '...' + argument_separator
+        for start in range(0, len(part), batch):
+            chunk = argument_separator.join(
+                [str(x) for x in part[start:start+batch]]
+            )
+            if start > 0:
+                chunk = argument_separator + chunk
+            yield chunk
+    yield closing
+    if len(parts) > 1:
+        yield f' ({n} elements)'
+
+
+def call_elements(function, rows, arglist_form=False):
+    """Return the results of function called on rows of arguments."""
+    ans = []
+    for row in rows:
+        # The elements are expensive, so the time is checked for each
+        BUDGET.check_time()
+        if arglist_form:
+            ans.append(function(ArgList(*row)))
+        else:
+            ans.append(function(*row))
+    return ans
+
+
+def map_elements(function, rows, arglist_form=False):
+    """Return the results of function called on rows (maybe in parallel).
+
+    The first few rows are calculated serially to estimate the time of the
+    rest; expensive rest is calculated by the workers (see parallel).
+    """
+    start = time.perf_counter()
+    ans = call_elements(function, rows[:SAMPLE_SIZE], arglist_form)
+    rest = rows[SAMPLE_SIZE:]
+    estimate = (time.perf_counter() - start) / len(ans) * len(rest)
+    if rest and estimate > MIN_TIME:
+        task = partial(call_elements, function, arglist_form=arglist_form)
+        results = map_chunks(task, rest)
+        if results is not None:
+            return ans + results
+    return ans + call_elements(function, rest, arglist_form)
+
+
+def generalize_array_input(function, unknown_name_input=False,
+                           parallel=False):
     """A decorator that generalizes the function on arrays (elementwise).
 
+    If unknown_name_input is set, an unknown name given as the first
+    argument is replaced by its text (see allow_unknown_name). If parallel
+    is set, long arrays of expensive elements are calculated by worker
+    processes (see map_elements).
     Note: this implementation does not cover unordered keyword variables.
     """
     def wrapper(*args, **kwargs):
+        if unknown_name_input and args and isinstance(args[0], UnknownName):
+            args = (args[0].name,) + args[1:]
         # Unpack if arguments are in arglist form
         arglist_form = False
         if len(args + tuple(kwargs)) == 1 and isinstance(args[0], ArgList):
@@ -591,14 +891,20 @@ def generalize_array_input(function):
             else:
                 new_args.append([arg for a in range(array_length)])
         ans = Array()
+        if parallel and array_length > 1:
+            ans.ls = map_elements(function, list(zip(*new_args)),
+                                  arglist_form)
+            return ans
         if arglist_form:  # Use the same form as in the input
             for array_member in range(array_length):
+                BUDGET.tick()
                 Array.join(
                     ans,
                     function(ArgList(*[row[array_member] for row in new_args]))
                 )
         else:
             for array_member in range(array_length):
+                BUDGET.tick()
                 Array.join(
                     ans,
                     function(*[row[array_member] for row in new_args])
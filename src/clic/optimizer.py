@@ -0,0 +1,155 @@
+"""This module optimizes expressions in postfix notation.
+
+Two optimizations are applied to the output of the shunting yard algorithm:
+- constant folding -- subtrees made only of pure tokens (numbers, constants
+  and pure functions of them) are calculated once and replaced by a number,
+- common subexpression elimination -- identical subtrees of pure functions
+  of variables are calculated once per evaluation; the first one stores
+  its value and the others load it.
+
+A token is pure if its result depends only on its arguments (for tokens
+without arguments: if it is a constant). Variables are not pure (they can
+be reassigned), so they are never folded, but reading them has no side
+effects, so subtrees using them can be shared.
+"""
+
+from clic.token import Token
+
+# Errors of subtrees left to be raised during evaluation (other errors,
+# e.g. exceeding the budget, stop the optimization)
+CALCULATION_ERRORS = (ArithmeticError, LookupError, TypeError, ValueError)
+
+
+def analyze(ls):
+    """Return the subtree data of a postfix list (None if it is invalid).
+
+    Returns:
+    starts -- the index of the first token of the subtree of each token,
+    foldable -- whether the subtree of each token consists of pure tokens,
+    keys -- the structure id of subtrees without side effects (or None),
+    firsts -- {structure id: the index of its first occurrence} for the
+      structures that occur more than once (and cannot be folded).
+    """
+    starts = []
+    foldable = []
+    keys = []
+    firsts = dict()
+    repeated = set()
+    ids = dict()
+    stack = []
+    for i, token in enumerate(ls):
+        if len(stack) < token.arg_num:
+            return None
+        children = stack[len(stack) - token.arg_num:]
+        del stack[len(stack) - token.arg_num:]
+        starts.append(starts[children[0]] if children else i)
+        foldable.append(token.pure and all(foldable[c] for c in children))
+        if children:
+            shared = token.pure and all(keys[c] is not None for c in children)
+        else:
+            shared = token.pure or token.kind == 'var'
+        if shared:
+            structure = (token.name, *(keys[c] for c in children))
+            key = ids.setdefault(structure, len(ids))
+            keys.append(key)
+            if children and not foldable[i]:
+                if key in firsts:
+                    repeated.add(key)
+                else:
+                    firsts[key] = i
+        else:
+            keys.append(None)
+        stack.append(i)
+    firsts = {key: firsts[key] for key in repeated}
+    return starts, foldable, keys, firsts
+
+
+def optimize(ls, fold, errors=CALCULATION_ERRORS):
+    """Return an optimized version of a postfix list of tokens.
+
+    Arguments:
+    ls -- a list of tokens in postfix notation,
+    fold -- a function calculating a postfix list of tokens (used for
+      constant folding),
+    errors -- the errors of fold meaning the subtree cannot be folded
+      (optional, CALCULATION_ERRORS by default).
+    """
+    data = analyze(ls)
+    if data is None:
+        # Leave the errors to perform_operations
+        return ls
+    starts, foldable, keys, firsts = data
+    # {first index: (last index, token)} replaces the subtree by the token,
+    # {last index: slot} stores the value of the subtree
+    replace = dict()
+    stores = dict()
+    loaded = set()
+    values = []
+    slots = dict()
+    # Visit the subtrees from the outermost ones (which end later)
+    i = len(ls) - 1
+    while i >= 0:
+        start = starts[i]
+        if foldable[i] and start < i:
+            try:
+                value = fold(ls[start:i + 1])
+            except errors:
+                # Keep the subtree to raise the error during evaluation;
+                # its parts are not folded (they would fail again)
+                i = start - 1
+                continue
+            name = ' '.join(token.name for token in ls[start:i + 1])
+            replace[start] = (i, Token.constant(value, f'{{{name}}}'))
+            i = start - 1
+            continue
+        key = keys[i]
+        if key in firsts:
+            if key not in slots:
+                slots[key] = len(values)
+                values.append(None)
+            if firsts[key] == i:
+                # The first occurrence calculates and stores the value
+                stores[i] = slots[key]
+            else:
+                replace[start] = (i, load_token(values, slots[key]))
+                loaded.add(slots[key])
+                i = start - 1
+                continue
+        i -= 1
+    if not replace:
+        return ls
+    # Occurrences inside replaced subtrees may leave a value unused
+    append = {
+        i: store_token(values, slot)
+        for i, slot in stores.items() if slot in loaded
+    }
+    ans = []
+    i = 0
+    while i < len(ls):
+        if i in replace:
+            i, token = replace[i]
+            ans.append(token)
+        else:
+            ans.append(ls[i])
+            if i in append:
+                ans.append(append[i])
+        i += 1
+    return ans
+
+
+def store_token(values, slot):
+    """Return a token storing its argument in values[slot]."""
+    def store(a):
+        if hasattr(a, 'frozen'):
+            # The stored value must not be extended in place by join
+            a.frozen = True
+        values[slot] = a
+        return a
+    return Token('__store__', store, 'static', 'func', pure=True)
+
+
+def load_token(values, slot):
+    """Return a token loading the value stored in values[slot]."""
+    def load():
+        return values[slot]
+    return Token('__load__', load, 'static', 'var', pure=True)
@@ -0,0 +1,99 @@
+"""This module renders calculator answers in machine-readable formats.
+
+Unlike Calculator.object_to_string, the numbers are written at full
+precision, and arrays and quantities keep their structure:
+- json -- numbers, lists and {"value": ..., "units": {...}} objects,
+- csv -- one line per array element, quantities as value and unit,
+- raw -- plain values, one array element per line.
+"""
+
+from decimal import Decimal
+from fractions import Fraction
+import csv
+import io
+import json
+
+from clic.mathclasses import ArgList, Array, Quantity, UnknownName
+
+
+def decimal_to_raw(x):
+    """Return the full precision string of a decimal (e.g. 1.5E+30)."""
+    if not x.is_finite():
+        return str(x)
+    x = x.normalize()
+    # Keep integers like 1200 in plain notation instead of 1.2E+3
+    if x.as_tuple().exponent > 0 and x.adjusted() < 30:
+        return format(x, 'f')
+    return str(x)
+
+
+def unit_map(quantity):
+    """Return the units of a quantity as a dictionary {unit: power}."""
+    ans = dict()
+    for unit in quantity.units:
+        power = quantity.units.get(unit)
+        if isinstance(power, Fraction):
+            power = str(power)
+        ans[unit] = power
+    return ans
+
+
+def to_json(obj):
+    """Return the JSON representation of obj."""
+    if obj is None:
+        return 'null'
+    if isinstance(obj, UnknownName):
+        obj.raise_error()
+    if isinstance(obj, Decimal):
+        if not obj.is_finite():
+            return json.dumps(str(obj))
+        return decimal_to_raw(obj)
+    if isinstance(obj, Quantity):
+        units = json.dumps(unit_map(obj), ensure_ascii=False)
+        return f'{{"value": {to_json(obj.value)}, "units": {units}}}'
+    if isinstance(obj, (Array, ArgList)):
+        return '[' + ', '.join(to_json(x) for x in obj) + ']'
+    if isinstance(obj, str):
+        return json.dumps(obj, ensure_ascii=False)
+    return json.dumps(str(obj), ensure_ascii=False)
+
+
+def to_raw(obj):
+    """Return the plain text representation of obj."""
+    if obj is None:
+        return ''
+    if isinstance(obj, UnknownName):
+        obj.raise_error()
+    if isinstance(obj, Decimal):
+        return decimal_to_raw(obj)
+    if isinstance(obj, Quantity):
+        return f'{to_raw(obj.value)} {obj.unit_str()}'
+    if isinstance(obj, (Array, ArgList)):
+        return '\n'.join(to_raw(x) for x in obj)
+    return str(obj)
+
+
+def csv_fields(obj):
+    """Return a list of CSV fields representing obj."""
+    if isinstance(obj, Quantity):
+        return [to_raw(obj.value), obj.unit_str()]
+    if isinstance(obj, (Array, ArgList)):
+        return [field for x in obj for field in csv_fields(x)]
+    return [to_raw(obj)]
+
+
+def to_csv(obj):
+    """Return the CSV representation of obj (a row per array element)."""
+    rows = obj if isinstance(obj, Array) else [obj]
+    file = io.StringIO()
+    writer = csv.writer(file, lineterminator='\n')
+    for row in rows:
+        writer.writerow(csv_fields(row))
+    return file.getvalue().rstrip('\n')
+
+
+FORMATS = {
+    'json': to_json,
+    'csv': to_csv,
+    'raw': to_raw,
+}
@@ -0,0 +1,114 @@
+"""This module calculates expensive elementwise operations in parallel.
+
+Tokens with the parallel option (e.g. '!' or 'pf') calculate long arrays
+in a shared pool of worker processes. The pool is started on first use with
+the 'fork' start method, so the workers share the loaded modules; without
+fork (or inside a daemon process) the calculation stays serial. Workers
+use the decimal context and the budget of the calculation they work for.
+"""
+
+import concurrent.futures
+import decimal
+import multiprocessing
+import os
+import pickle
+
+from clic.budget import BUDGET
+
+# Estimated serial time (in seconds) worth starting the workers for
+MIN_TIME = 0.05
+# The number of elements timed to estimate the serial time
+SAMPLE_SIZE = 8
+# The number of chunks per worker (smaller chunks balance the load)
+CHUNKS_PER_WORKER = 4
+
+WORKERS = os.cpu_count() or 1
+POOL = None
+POOL_PID = None
+
+
+def set_workers(n):
+    """Set the number of worker processes (0 means one per CPU)."""
+    global WORKERS
+    n = n or os.cpu_count() or 1
+    if n != WORKERS:
+        shutdown()
+    WORKERS = n
+
+
+def shutdown():
+    """Stop the worker processes (if started by this process)."""
+    global POOL
+    if POOL is not None and POOL_PID == os.getpid():
+        POOL.shutdown(cancel_futures=True)
+    POOL = None
+
+
+def discard_pool():
+    """Stop the workers at once (even in the middle of a chunk)."""
+    global POOL
+    if POOL is not None and POOL_PID == os.getpid():
+        if hasattr(POOL, 'terminate_workers'):  # Python 3.14+
+            POOL.terminate_workers()
+        else:
+            processes = list(POOL._processes.values())
+            POOL.shutdown(wait=False, cancel_futures=True)
+            for process in processes:
+                process.terminate()
+    POOL = None
+
+
+def get_pool():
+    """Return the pool of workers (or None if it cannot be used)."""
+    global POOL, POOL_PID
+    if WORKERS < 2 \
+            or 'fork' not in multiprocessing.get_all_start_methods() \
+            or multiprocessing.current_process().daemon:
+        return None
+    # A forked process cannot use the pool of its parent
+    if POOL is None or POOL_PID != os.getpid():
+        POOL = concurrent.futures.ProcessPoolExecutor(
+            WORKERS, mp_context=multiprocessing.get_context('fork')
+        )
+        POOL_PID = os.getpid()
+    return POOL
+
+
+def run_chunk(task, chunk, context, budget):
+    """Return task(chunk) calculated in the given context and budget."""
+    decimal.setcontext(context)
+    BUDGET.resume(budget)
+    return task(chunk)
+
+
+def map_chunks(task, items):
+    """Return the results of task on items split into chunks, in order.
+
+    The task takes a list of items and returns a list of results. Returns
+    None if the items cannot be calculated by the workers. When a chunk
+    fails, the pool is discarded, so that the chunks still running do not
+    keep the workers busy (a new pool is started when needed).
+    """
+    try:
+        pickle.dumps(task)
+    except Exception:
+        return None
+    pool = get_pool()
+    if pool is None:
+        return None
+    size = -(-len(items) // (WORKERS * CHUNKS_PER_WORKER))
+    context = decimal.getcontext().copy()
+    budget = BUDGET.state()
+    futures = [
+        pool.submit(run_chunk, task, items[i:i + size], context, budget)
+        for i in range(0, len(items), size)
+    ]
+    ans = []
+    try:
+        # The first error of the items is raised (like in a serial loop)
+        for future in futures:
+            ans += future.result()
+    except BaseException:
+        discard_pool()
+        raise
+    return ans
@@ -0,0 +1,60 @@
+"""This module provides the timing profile of calculations.
+
+A Profile collects the wall time of every stage of the calculator pipeline
+and the number of calls and the cumulative time of each token during the
+first evaluation pass (the second pass is reported as a single stage).
+It receives the timings as callbacks of the calculator hooks.
+"""
+
+
+class Profile:
+    """The Profile object collects timings of a calculation."""
+
+    def __init__(self):
+        """The initialiser of the class."""
+        self.stages = dict()
+        self.calls = dict()
+
+    def attach(self, hooks):
+        """Start receiving timings from hooks."""
+        hooks.add('stage_end', self.on_stage_end)
+        hooks.add('token_call', self.on_token_call)
+
+    def detach(self, hooks):
+        """Stop receiving timings from hooks."""
+        hooks.remove('stage_end', self.on_stage_end)
+        hooks.remove('token_call', self.on_token_call)
+
+    def add(self, name, seconds):
+        """Add time spent in the stage called name."""
+        self.stages[name] = self.stages.get(name, 0) + seconds
+
+    def on_stage_end(self, event):
+        """Add the time of a finished stage."""
+        self.add(event['name'], event['duration'])
+
+    def on_token_call(self, event):
+        """Count the call of a token."""
+        count, total = self.calls.get(event['name'], (0, 0))
+        self.calls[event['name']] = (count + 1, total + event['duration'])
+
+    def report(self, limit=10):
+        """Return the profile as a string (with at most limit tokens)."""
+        total = sum(self.stages.values())
+        lines = [f'profile: {format_time(total)} in total']
+        for name, seconds in self.stages.items():
+            lines.append(f'  {name:<28}{format_time(seconds)}')
+        calls = sorted(self.calls.items(), key=lambda x: -x[1][1])
+        if calls:
+            lines.append('token calls (first pass):')
+        for name, (count, seconds) in calls[:limit]:
+            name = name.strip().replace('__', '') or name
+            lines.append(f'  {name:<18}{count:>6} x {format_time(seconds)}')
+        if len(calls) > limit:
+            lines.append(f'  ... ({len(calls) - limit} more)')
+        return '\n'.join(lines)
+
+
+def format_time(seconds):
+    """Return a time in milliseconds as a string."""
+    return f'{seconds * 1000:10.3f} ms'
@@ -0,0 +1,99 @@
+"""This module runs script files (worksheets) with the calculator.
+
+Every line of a script is calculated like a line typed into the prompt
+(empty lines and lines starting with '#' are skipped). The compiled
+expressions are cached beside the script (sheet.clic -> sheet.clicc), so
+unchanged scripts skip the split and the compilation of every line.
+The cache is valid for the same modification time and size of the script
+and the same token table (see Calculator.token_table_version); it is a
+JSON file with a format version (like the sessions).
+"""
+
+import json
+import os
+import sys
+
+FORMAT = 'clic-cache'
+VERSION = 1
+
+
+def cache_path(path):
+    """Return the path of the cache of the script."""
+    return path + 'c'
+
+
+def cache_key(ctor, path):
+    """Return the key the cache of the script must match."""
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size, ctor.token_table_version())
+
+
+def read_cache(path, key):
+    """Return the cached lines {line number: compiled} (or {} if stale)."""
+    try:
+        with open(path, encoding='utf-8') as file:
+            data = json.load(file)
+        if data['format'] != FORMAT or data['version'] != VERSION \
+                or data['key'] != list(key):
+            return dict()
+        return {
+            int(number): tuple(
+                (tuple(words), None if packed is None
+                 else tuple(tuple(pair) for pair in packed))
+                for words, packed in compiled
+            )
+            for number, compiled in data['lines'].items()
+        }
+    except (OSError, ValueError, LookupError, TypeError):
+        return dict()
+
+
+def write_cache(path, key, lines):
+    """Write the compiled lines to the cache (ignoring unwritable paths)."""
+    data = {
+        'format': FORMAT,
+        'version': VERSION,
+        'key': list(key),
+        'lines': lines,
+    }
+    try:
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(data, file, ensure_ascii=False)
+    except OSError:
+        pass
+
+
+def run(ctor, path, file=sys.stdout):
+    """Calculate the lines of a script and print the answers.
+
+    Returns the number of lines that raised errors.
+    """
+    with open(path, encoding='utf-8') as script:
+        lines = script.read().splitlines()
+    key = cache_key(ctor, path)
+    cache = read_cache(cache_path(path), key)
+    compiled = dict()
+    errors = 0
+    for number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        done = ctor.calculate(line, cache.get(number))
+        flag, ans = ctor.get_answer()
+        if flag:
+            errors += 1
+            print(f'{path}:{number}: {ans}', file=sys.stderr)
+            continue
+        if number in cache:
+            compiled[number] = cache[number]
+        else:
+            compiled[number] = tuple(
+                (tuple(words), None if postfix is None
+                 else ctor.pack(postfix))
+                for words, postfix in done
+            )
+        if not ctor.silent:
+            print(f'{line} = {ans}', file=file)
+    if compiled != cache:
+        write_cache(cache_path(path), key, compiled)
+    return errors
@@ -0,0 +1,143 @@
+"""This module saves and restores calculator sessions.
+
+A session consists of the user variables and the reactive definitions.
+Sessions are stored in ~/.clic/sessions as JSON files with a format
+version, so restoring them does not go through the calculator pipeline.
+Arrays of numbers are written in bulk as one string.
+"""
+
+from decimal import Decimal
+from fractions import Fraction
+import json
+import os
+
+from clic.mathclasses import ArgList, Array, Quantity
+
+SESSION_DIR = os.path.expanduser('~/.clic/sessions')
+FORMAT = 'clic-session'
+VERSION = 1
+
+
+class SessionError(Exception):
+    """An error class for unreadable sessions."""
+
+
+def session_path(name):
+    """Return the path of the session called name."""
+    if not name or os.sep in name or name.startswith('.'):
+        raise SessionError(f"invalid session name: '{name}'")
+    return os.path.join(SESSION_DIR, name + '.json')
+
+
+def encode(obj):
+    """Return obj as a tuple of JSON values (None if impossible)."""
+    if isinstance(obj, Decimal):
+        return ('d', str(obj))
+    if isinstance(obj, str):
+        return ('s', obj)
+    if isinstance(obj, Quantity):
+        value = encode(obj.value)
+        if value is None:
+            return None
+        units = []
+        for unit in obj.units:
+            power = Fraction(obj.units.get(unit))
+            units.append((unit, power.numerator, power.denominator))
+        return ('q', value, tuple(units))
+    if isinstance(obj, (Array, ArgList)):
+        kind = 'a' if isinstance(obj, Array) else 'l'
+        if all(isinstance(x, Decimal) for x in obj):
+            # Numbers are written in bulk
+            return (kind + 'd', ' '.join(map(str, obj)))
+        elements = tuple(encode(x) for x in obj)
+        if None in elements:
+            return None
+        return (kind, elements)
+    return None
+
+
+def decode(data):
+    """Return the object encoded as data."""
+    kind = data[0]
+    if kind == 'd':
+        return Decimal(data[1])
+    if kind == 's':
+        return data[1]
+    if kind == 'q':
+        units = dict()
+        for unit, numerator, denominator in data[2]:
+            if denominator == 1:
+                units[unit] = numerator
+            else:
+                units[unit] = Fraction(numerator, denominator)
+        return Quantity(decode(data[1]), units)
+    if kind in ('ad', 'ld', 'a', 'l'):
+        cls = Array if kind[0] == 'a' else ArgList
+        ans = cls()
+        if kind[1:] == 'd':
+            ans.ls = [Decimal(x) for x in data[1].split()]
+        else:
+            ans.ls = [decode(x) for x in data[1]]
+        return ans
+    raise SessionError('unknown data in the session')
+
+
+def save(name, variables, definitions):
+    """Save a session and return the number of saved variables.
+
+    Arguments:
+    name -- the name of the session,
+    variables -- a dictionary {name: value},
+    definitions -- a dictionary {name: (expression, variables read)} of
+      the reactive variables.
+    """
+    encoded = dict()
+    for var, value in variables.items():
+        data = encode(value)
+        if data is not None:
+            encoded[var] = data
+    definitions = {
+        var: (list(ls), sorted(reads))
+        for var, (ls, reads) in definitions.items() if var in encoded
+    }
+    data = {
+        'format': FORMAT,
+        'version': VERSION,
+        'variables': encoded,
+        'definitions': definitions,
+    }
+    path = session_path(name)
+    os.makedirs(SESSION_DIR, exist_ok=True)
+    # Replace the old session only when the new one is complete
+    with open(path + '.tmp', 'w', encoding='utf-8') as file:
+        json.dump(data, file, ensure_ascii=False)
+    os.replace(path + '.tmp', path)
+    return len(encoded)
+
+
+def load(name):
+    """Return the variables and the definitions of a saved session."""
+    path = session_path(name)
+    if not os.path.exists(path):
+        raise SessionError(f"no session named '{name}'")
+    try:
+        with open(path, encoding='utf-8') as file:
+            data = json.load(file)
+        if data['format'] != FORMAT:
+            raise ValueError
+        if data['version'] > VERSION:
+            raise SessionError(
+                f"session '{name}' needs a newer version of clic"
+            )
+        variables = {
+            var: decode(value) for var, value in data['variables'].items()
+        }
+        definitions = {
+            var: (list(ls), set(reads))
+            for var, (ls, reads) in data['definitions'].items()
+        }
+    except (ArithmeticError, AttributeError, LookupError, TypeError,
+            ValueError):
+        # A damaged file, e.g. a bad number or a variable entry
+        raise SessionError(f"invalid session file: '{path}'")
+    return variables, definitions
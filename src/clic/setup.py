@@ -4,32 +4,39 @@ from decimal import Decimal
 
 from clic.mathclasses import ArgList
 from clic.mathclasses import glob_pi, glob_e, glob_inf
+from clic.mathclasses import power
 
 
-sq_root = (lambda a: a ** Decimal('0.5'))
+sq_root = (lambda a: power(a, Decimal('0.5')))
+
+# Options of the tokens that can be calculated in advance
+pure = {'pure': True}
 
 CLIC_TOKENS = [
     [['('], lambda: None, 'static (', 'Opening parenthesis'],
     [[')'], lambda: None, 'static )', 'Closing parenthesis'],
-    [['+'], lambda a, b: a + b, 'addition oper', 'Addition'],
-    [['-'], lambda a, b: a - b, 'addition oper', 'Subtraction'],
-    [['*'], lambda a, b: a * b, 'mul-tion oper', 'Multiplication'],
-    [[':'], lambda a, b: a / b, 'mul-tion oper', 'Inline division'],
-    [['^'], lambda a, b: a ** b, 'strong oper', 'Exponentiation',
-     {'reverse': True}],
-    [[' -'], lambda a: -a, 'strong func', 'Negation'],
-    [[' +'], lambda a: +a, 'strong func', 'Positition'],
+    [['+'], lambda a, b: a + b, 'addition oper', 'Addition', pure],
+    [['-'], lambda a, b: a - b, 'addition oper', 'Subtraction', pure],
+    [['*'], lambda a, b: a * b, 'mul-tion oper', 'Multiplication', pure],
+    [[':'], lambda a, b: a / b, 'mul-tion oper', 'Inline division', pure],
+    [['^'], power,     'strong oper', 'Exponentiation',
+     {'reverse': True, 'pure': True}],
+    [[' -'], lambda a: -a, 'strong func', 'Negation', pure],
+    [[' +'], lambda a: +a, 'strong func', 'Positition', pure],
     [['__imp_mul__'], lambda a, b: a * b, 'normal oper',
-     'Implicit multiplication', {'reverse': True}],
-    [['__arg_sep__'], ArgList.join, 'light oper', 'Argument separator'],
-    [['/'], lambda a, b: a / b,  'light oper', 'Fraction bar'],
-    [['∞', 'infty'], lambda: glob_inf, 'static var', 'Infinity'],
-    [['π', 'pi'], lambda: glob_pi,   'static var', 'The number pi'],
-    [['e'], lambda: glob_e,          'static var', 'The number e'],
-    [['sqrt'], sq_root,   'strong func', 'Square root'],
-    [['√'], sq_root,      'static open', 'Square root', {'closes': "'"}],
+     'Implicit multiplication', {'reverse': True, 'pure': True}],
+    [['__arg_sep__'], ArgList.join, 'light oper', 'Argument separator',
+     pure],
+    [['/'], lambda a, b: a / b,  'light oper', 'Fraction bar', pure],
+    [['∞', 'infty'], lambda: glob_inf, 'static var', 'Infinity', pure],
+    [['π', 'pi'], lambda: glob_pi,   'static var', 'The number pi', pure],
+    [['e'], lambda: glob_e,          'static var', 'The number e', pure],
+    [['sqrt'], sq_root,   'strong func', 'Square root', pure],
+    [['√'], sq_root,      'static open', 'Square root',
+     {'closes': "'", 'pure': True}],
     [["'"], lambda: None, 'static clos', 'Square root', {'closes': '√'}],
-    [[' |'], abs,         'static open', 'Absolute value', {'closes': '|'}],
+    [[' |'], abs,         'static open', 'Absolute value',
+     {'closes': '|', 'pure': True}],
     [['|'], lambda: None, 'static clos', 'Absolute value', {'closes': ' |'}],
 ]
 
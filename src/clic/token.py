@@ -5,7 +5,7 @@ numbers, variables, operators, and functions. To view / modify
 the list of tokens used in the calculator see functions.py.
 """
 
-import copy
+from functools import partial
 import clic.mathclasses as mathclasses
 from clic.mathclasses import (
     allow_unknown_name,
@@ -15,15 +15,34 @@ from clic.mathclasses import (
 
 def define_meta(function):
     """A wrapper to provide functions in distant modules with math classes."""
+    return partial(function, META=mathclasses)
 
-    def wrapper(*args, **kwargs):
-        return function(*args, **kwargs, META=mathclasses)
 
-    return wrapper
+def dispatch(function, array_input=False, unknown_name_input=False,
+             use_meta=False, parallel=False):
+    """Return the token function with all requested options applied.
+
+    The options are combined into (at most) one wrapper, so that calling
+    a token does not go through a stack of closures.
+    """
+    if use_meta:
+        function = define_meta(function)
+    if array_input:
+        return generalize_array_input(function, unknown_name_input, parallel)
+    if unknown_name_input:
+        return allow_unknown_name(function)
+    return function
 
 
 class Token:
-    """Token objects are data storage and data transformation elements."""
+    """Token objects are data storage and data transformation elements.
+
+    Tokens are not changed after creation, and the values they hold are
+    treated as immutable, so they are shared instead of copied.
+    """
+
+    __slots__ = ('name', 'calc', 'arg_num', 'ltor', 'pref', 'kind', 'ht',
+                 'closes', 'module', 'pure')
 
     pref_verbose = {
         'light': 0,
@@ -42,7 +61,7 @@ class Token:
 
     def __init__(self, name, calc, pref, kind, ht='', reverse=False,
                  closes=None, array_input=False, unknown_name_input=False,
-                 use_meta=False):
+                 use_meta=False, module=None, pure=False, parallel=False):
         """The initialiser of the class.
 
         Arguments:
@@ -56,16 +75,17 @@ class Token:
         closes -- the closing/opening pair of the token (optional),
         array_input -- whether to explicitly manage array calculations,
         unknown_name_input -- whether to allow unknown names to be used
-          instead of text input (optional).
+          instead of text input (optional),
+        use_meta -- whether to pass the math classes to calc (optional),
+        module -- the name of the module defining the token (optional),
+        pure -- whether the result depends only on the arguments, without
+          side effects (optional, pure tokens can be calculated in advance),
+        parallel -- whether long arrays may be calculated by worker processes
+          (optional, for expensive array_input tokens).
         """
         self.name = name
-        if use_meta:
-            calc = define_meta(calc)
-        if array_input:
-            calc = generalize_array_input(calc)
-        if unknown_name_input:
-            calc = allow_unknown_name(calc)
-        self.calc = calc
+        self.calc = dispatch(calc, array_input, unknown_name_input, use_meta,
+                             parallel)
         if kind in ('func', 'sign', 'open'):
             self.arg_num = 1
         elif kind in ('oper', 'doub'):
@@ -83,7 +103,8 @@ class Token:
         self.kind = kind
         self.ht = ht
         self.closes = closes
-        self.module = None
+        self.module = module
+        self.pure = pure
 
     @staticmethod
     def give(obj):
@@ -94,14 +115,24 @@ class Token:
         1024
         """
         def func():
-            return copy.copy(obj)
+            return obj
         return func
 
     @staticmethod
     def wrap(obj, name='', ht='Variable'):
         """Return a token that wraps obj."""
+        if isinstance(obj, (mathclasses.ArgList, mathclasses.Array)):
+            # Stored arrays must not be extended in place by join
+            obj.frozen = True
         return Token(name, Token.give(obj), 'static', 'var', ht)
 
+    @staticmethod
+    def constant(obj, name=''):
+        """Return a pure token that wraps obj (e.g. a number)."""
+        if isinstance(obj, (mathclasses.ArgList, mathclasses.Array)):
+            obj.frozen = True
+        return Token(name, Token.give(obj), 'static', 'num', pure=True)
+
     @staticmethod
     def with_alt(names, calc, pref, kind, ht='', reverse=False, closes=None):
         """Create a token with alternative names (as a tuple)."""
@@ -111,11 +142,11 @@ class Token:
         )
 
     @staticmethod
-    def from_config(names, calc, kind, ht='', options={}):
+    def from_config(names, calc, kind, ht='', options={}, module=None):
         """Create a tuple of tokens using configuration setup."""
         pref, kind = kind.split(' ')
         return (
-            Token(name, calc, pref, kind, ht, **options)
+            Token(name, calc, pref, kind, ht, module=module, **options)
             for name in names
         )
 
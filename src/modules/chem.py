@@ -1,6 +1,7 @@
 """Module with chemical functions."""
 
 from decimal import Decimal
+from functools import lru_cache
 
 D = Decimal
 N_AVOGADRO = Decimal('6.02214076e23')
@@ -155,27 +156,70 @@ def get_atomic_mass(element, precision):
     return round(TABLE[element], precision)
 
 
-def get_few_atoms_mass(element, precision):
-    """Get the mass a few atoms of a single chemical element.
+def read_number(compound, i):
+    """Read the index starting at position i of the compound.
 
-    Arguments:
-    element -- the element and index (e.g. 'Cl2'),
-    precision -- the required precision.
+    Returns the index (1 if there are no digits) and the next position.
     """
-    if element.isalpha():
-        if element not in TABLE:
-            raise ValueError('incorrect compound name')
-        return get_atomic_mass(element, precision)
-    else:
-        if len(element) < 2:
-            raise ValueError('incorrect compound name')
-        elif element[-2].isdigit():
-            element, n = element[:-2], element[-2:]
+    j = i
+    while j < len(compound) and compound[j].isdigit():
+        j += 1
+    if j == i:
+        return 1, i
+    return int(compound[i:j]), j
+
+
+@lru_cache(maxsize=1024)
+def parse_formula(compound, Multiset):
+    """Return a multiset that counts the atoms of each element in compound.
+
+    Brackets may be nested arbitrarily and hydrates are written with an
+    asterisk (e.g. 'CuSO4*5H2O'); underscores are ignored.
+    """
+    compound = compound.replace('_', '')
+    closing = {')': '(', ']': '['}
+    # Atoms of the finished hydrate parts
+    total = Multiset({})
+    # A stack of (opening bracket, atoms counted inside the brackets)
+    stack = [('', Multiset({}))]
+    coefficient, i = read_number(compound, 0)
+    while i < len(compound):
+        char = compound[i]
+        if char.isupper():
+            j = i + 1
+            while j < len(compound) and compound[j].islower():
+                j += 1
+            element = compound[i:j]
+            if element not in TABLE:
+                raise ValueError('incorrect compound name')
+            n, i = read_number(compound, j)
+            bracket, atoms = stack[-1]
+            stack[-1] = (bracket, atoms + Multiset({element: n}))
+        elif char in '([':
+            stack.append((char, Multiset({})))
+            i += 1
+        elif char in ')]':
+            bracket, atoms = stack.pop()
+            if not stack or bracket != closing[char]:
+                raise ValueError('incorrect compound name')
+            n, i = read_number(compound, i + 1)
+            bracket, outer = stack[-1]
+            stack[-1] = (bracket, outer + atoms * n)
+        elif char in '*·' and len(stack) == 1 and stack[0][1]:
+            total = total + stack[0][1] * coefficient
+            stack = [('', Multiset({}))]
+            coefficient, i = read_number(compound, i + 1)
         else:
-            element, n = element[:-1], element[-1:]
-        if element not in TABLE:
             raise ValueError('incorrect compound name')
-        return get_atomic_mass(element, precision) * int(n)
+    if len(stack) != 1 or not stack[0][1]:
+        raise ValueError('incorrect compound name')
+    return total + stack[0][1] * coefficient
+
+
+@lru_cache(maxsize=None)
+def mass_table(precision):
+    """Return the table of atomic masses rounded to the given precision."""
+    return {element: get_atomic_mass(element, precision) for element in TABLE}
 
 
 def mass_precision(precision=None):
@@ -184,45 +228,24 @@ def mass_precision(precision=None):
     Returns a function that takes the compound name & returns its molar mass.
     """
 
-    def wrapper(compound):
-        import re
-        # Ignore all underscores
-        compound = re.sub(r'\_', r'', compound)
-        # Split the compound into 'digestable' parts
-        compound = re.sub(r'([A-Z()\[\]*])', r' \1', compound)[1:]
-        # Go over all parts and find the total mass
-        mass_levels = [0, 0, 0, 0]
-        current_level = 1
-        for part in compound.split():
-            if part in ('(', '['):
-                current_level += 1
-            elif ')' in part or ']' in part:
-                n = 1
-                if len(part) > 1:
-                    n = int(part[1:])
-                mass_levels[current_level-1] += mass_levels[current_level] * n
-                mass_levels[current_level] = 0
-                current_level -= 1
-            elif part == '*':
-                mass_levels[0] += mass_levels[1]
-                mass_levels[1] = 0
-            else:
-                mass_levels[current_level] += get_few_atoms_mass(
-                    part,
-                    precision
-                )
-        mass_levels[0] += mass_levels[1]
-        mass_levels[1] = 0
-        if mass_levels[1] + mass_levels[2] + mass_levels[3] != 0:
+    def wrapper(compound, META):
+        # Unquoted names inside arrays arrive as unknown names
+        compound = getattr(compound, 'name', compound)
+        if not isinstance(compound, str):
             raise ValueError('incorrect compound name')
-        return mass_levels[0]
+        atoms = parse_formula(compound, META.Multiset)
+        table = mass_table(precision)
+        return sum(table[element] * atoms.get(element) for element in atoms)
 
     return wrapper
 
 
 CLIC_TOKENS = [
     [['M'], mass_precision(0), 'normal func', 'Molar mass of compound',
-     {'unknown_name_input': True}],
-    [['NA', 'N_A'], lambda: N_AVOGADRO, 'static var', "Avogadro's constant"],
-    [['Vm', 'V_m'], lambda: MOLAR_VOLUME, 'static var', "Molar volume at STP"],
+     {'unknown_name_input': True, 'array_input': True, 'use_meta': True,
+      'pure': True}],
+    [['NA', 'N_A'], lambda: N_AVOGADRO, 'static var', "Avogadro's constant",
+     {'pure': True}],
+    [['Vm', 'V_m'], lambda: MOLAR_VOLUME, 'static var', "Molar volume at STP",
+     {'pure': True}],
 ]
@@ -1,78 +1,510 @@
 """Module with combiantorics and number theory math."""
 
 from decimal import Decimal
+import decimal
+import math
+
+from clic.budget import BUDGET
+
+# ln(2 * pi), used by the Stirling series
+LN_2PI = Decimal('1.83787706640934548356065947281123527972279494727556683')
+# Coefficients B_2k / (2k * (2k - 1)) of the Stirling series
+STIRLING = [
+    (1, 12), (-1, 360), (1, 1260), (-1, 1680),
+    (1, 1188), (-691, 360360), (1, 156), (-3617, 122400),
+]
+# Results with more digits than this are computed via log-gamma
+EXACT_DIGITS = 20000
+# Memoized factorials of small numbers
+FACTORIAL_TABLE = [1]
+TABLE_SIZE = 256
+
+
+def to_natural(x, name):
+    """Return x as a non-negative int or raise an error."""
+    if x != int(x) or x < 0:
+        raise ValueError(f'{name} of a non-natural number')
+    return int(x)
+
+
+def product_range(a, b):
+    """Return the product of integers from a to b by binary splitting."""
+    if a > b:
+        return 1
+    if b - a < 8:
+        ans = a
+        for i in range(a + 1, b + 1):
+            ans *= i
+        return ans
+    m = (a + b) // 2
+    return product_range(a, m) * product_range(m + 1, b)
+
+
+def exact_factorial(n):
+    """Return n! as an exact int."""
+    if n < TABLE_SIZE:
+        while len(FACTORIAL_TABLE) <= n:
+            FACTORIAL_TABLE.append(FACTORIAL_TABLE[-1] * len(FACTORIAL_TABLE))
+        return FACTORIAL_TABLE[n]
+    return exact_factorial(TABLE_SIZE - 1) * product_range(TABLE_SIZE, n)
+
+
+def ln_factorial(n):
+    """Return ln(n!) at the current precision (Stirling series)."""
+    if n < 1000:
+        return Decimal(exact_factorial(n)).ln()
+    n = Decimal(n)
+    ans = n * n.ln() - n + (LN_2PI + n.ln()) / 2
+    n_squared = n * n
+    n_power = n
+    for numerator, denominator in STIRLING:
+        ans += Decimal(numerator) / (denominator * n_power)
+        n_power *= n_squared
+    return ans
+
+
+def digits(ln_value):
+    """Return the approximate number of digits of exp(ln_value)."""
+    return ln_value / math.log(10)
+
+
+def from_ln(terms, estimate):
+    """Return exp(sum of ln_factorial(n) * sign) for (n, sign) in terms.
+
+    Arguments:
+    terms -- a list of tuples (n, sign),
+    estimate -- a float estimate of the resulting natural logarithm.
+    """
+    prec = decimal.getcontext().prec
+    with decimal.localcontext() as ctx:
+        # Enough digits for the integer part of the logarithm
+        ctx.prec = prec + len(str(int(abs(estimate)))) + 5
+        ctx.Emax = decimal.MAX_EMAX
+        ctx.Emin = decimal.MIN_EMIN
+        ln_value = sum(ln_factorial(n) * sign for n, sign in terms)
+        ans = ln_value.exp()
+        ctx.prec = prec
+        return +ans
 
 
 def factorial(x):
     """Return the factorial of x."""
-    ans = 1
-    i = 2
-    while i <= x:
-        ans *= i
-        i += 1
-    return Decimal(ans)
+    n = to_natural(x, 'factorial')
+    estimate = math.lgamma(n + 1)
+    if digits(estimate) <= EXACT_DIGITS:
+        BUDGET.check_digits(digits(estimate))
+        return Decimal(exact_factorial(n))
+    return from_ln([(n, 1)], estimate)
 
 
-def permutations(args=None, n=None, k=None):
-    """Return the number of k-permutations on a set of n elements."""
-    if args:
-        n, k = tuple(args)
+def falling_factorial(n, k):
+    """Return n * (n-1) * ... * (n-k+1) for a Decimal n."""
     ans = Decimal('1')
     i = Decimal('0')
     while i < k:
+        BUDGET.tick()
         ans *= (n - i)
         i += 1
     return ans
 
 
+def permutations(args=None, n=None, k=None):
+    """Return the number of k-permutations on a set of n elements."""
+    if args:
+        n, k = tuple(args)
+    k = to_natural(k, 'permutations')
+    if n != int(n):
+        return falling_factorial(n, k)
+    n = int(n)
+    if n < 0 or k > n:
+        return Decimal(product_range(n - k + 1, n))
+    estimate = math.lgamma(n + 1) - math.lgamma(n - k + 1)
+    if digits(estimate) <= EXACT_DIGITS:
+        BUDGET.check_digits(digits(estimate))
+        return Decimal(product_range(n - k + 1, n))
+    return from_ln([(n, 1), (n - k, -1)], estimate)
+
+
 def combinations(args=None, n=None, k=None):
     """Return the number of k-combinations on a set of n elements."""
     if args:
         n, k = tuple(args)
-    return permutations(n=n, k=k) / factorial(k)
+    k = to_natural(k, 'combinations')
+    if n != int(n):
+        return falling_factorial(n, k) / factorial(k)
+    n = int(n)
+    if n < 0:
+        return Decimal(product_range(n - k + 1, n) // exact_factorial(k))
+    if k > n:
+        return Decimal(0)
+    k = min(k, n - k)
+    estimate = math.lgamma(n + 1) - math.lgamma(k + 1) \
+        - math.lgamma(n - k + 1)
+    if digits(estimate) <= EXACT_DIGITS:
+        BUDGET.check_digits(digits(estimate))
+        # Multiplicative formula n (n-1) ... (n-k+1) / k!
+        return Decimal(product_range(n - k + 1, n) // exact_factorial(k))
+    return from_ln([(n, 1), (k, -1), (n - k, -1)], estimate)
+
+
+# Trial division limit and the cached table of primes below it
+SMALL_PRIME_LIMIT = 1000
+SMALL_PRIMES = []
+# Miller-Rabin bases, deterministic for all n < MILLER_RABIN_LIMIT
+MILLER_RABIN_BASES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41)
+MILLER_RABIN_LIMIT = 3317044064679887385961981
+
+
+def simple_sieve(n):
+    """Return a list of all primes below n (sieve of Eratosthenes)."""
+    sieve = bytearray([1]) * max(n, 2)
+    sieve[0] = sieve[1] = 0
+    for i in range(2, math.isqrt(n) + 1):
+        if sieve[i]:
+            sieve[i*i::i] = bytearray(len(range(i*i, n, i)))
+    return [i for i, flag in enumerate(sieve) if flag]
+
+
+def small_primes():
+    """Return the cached list of primes below SMALL_PRIME_LIMIT."""
+    if not SMALL_PRIMES:
+        SMALL_PRIMES.extend(simple_sieve(SMALL_PRIME_LIMIT))
+    return SMALL_PRIMES
+
+
+def is_strong_probable_prime(n, a):
+    """Return whether odd n passes the Miller-Rabin test to base a."""
+    d, s = n - 1, 0
+    while d % 2 == 0:
+        d //= 2
+        s += 1
+    x = pow(a, d, n)
+    if x in (1, n - 1):
+        return True
+    for _ in range(s - 1):
+        x = x * x % n
+        if x == n - 1:
+            return True
+    return False
+
+
+def jacobi(a, n):
+    """Return the Jacobi symbol (a/n) for odd positive n."""
+    a %= n
+    ans = 1
+    while a:
+        while a % 2 == 0:
+            a //= 2
+            if n % 8 in (3, 5):
+                ans = -ans
+        a, n = n, a
+        if a % 4 == 3 and n % 4 == 3:
+            ans = -ans
+        a %= n
+    return ans if n == 1 else 0
+
+
+def half(x, n):
+    """Return x / 2 modulo odd n."""
+    if x % 2:
+        x += n
+    return x // 2 % n
+
+
+def is_strong_lucas_probable_prime(n):
+    """Return whether odd n (not a square) passes the strong Lucas test.
+
+    The parameters are chosen by Selfridge's method: D is the first of
+    5, -7, 9, -11, ... with (D/n) = -1, P = 1 and Q = (1 - D) / 4.
+    """
+    D = 5
+    while jacobi(D, n) != -1:
+        if math.gcd(D, n) not in (1, n):
+            return False
+        D = -D - 2 if D > 0 else -D + 2
+    Q = (1 - D) // 4
+    d, s = n + 1, 0
+    while d % 2 == 0:
+        d //= 2
+        s += 1
+    # U_k, V_k and Q^k modulo n, starting from k = 1 (P = 1)
+    U, V, Qk = 1, 1, Q % n
+    for bit in bin(d)[3:]:
+        BUDGET.tick()
+        U, V, Qk = U * V % n, (V * V - 2 * Qk) % n, Qk * Qk % n
+        if bit == '1':
+            U, V = half(U + V, n), half(D * U + V, n)
+            Qk = Qk * Q % n
+    if U == 0 or V == 0:
+        return True
+    for _ in range(s - 1):
+        V, Qk = (V * V - 2 * Qk) % n, Qk * Qk % n
+        if V == 0:
+            return True
+    return False
+
+
+def is_prime(n):
+    """Return whether n is prime.
+
+    The Miller-Rabin test is deterministic below MILLER_RABIN_LIMIT; above
+    it the strong Lucas test is added (the Baillie-PSW test, which has no
+    known counterexamples, though none is proven not to exist).
+    """
+    if n < 2:
+        return False
+    for p in small_primes():
+        if n % p == 0:
+            return n == p
+    if n < SMALL_PRIME_LIMIT ** 2:
+        return True
+    for a in MILLER_RABIN_BASES:
+        BUDGET.check_time()
+        if not is_strong_probable_prime(n, a):
+            return False
+    if n < MILLER_RABIN_LIMIT:
+        return True
+    if math.isqrt(n) ** 2 == n:
+        return False
+    return is_strong_lucas_probable_prime(n)
+
+
+def pollard_brent(n):
+    """Return a nontrivial divisor of composite n (Brent's variant)."""
+    if n % 2 == 0:
+        return 2
+    for c in range(1, n):
+        y, r, q, g = 2, 1, 1, 1
+        batch = 128
+        while g == 1:
+            x = y
+            for _ in range(r):
+                y = (y * y + c) % n
+            k = 0
+            while k < r and g == 1:
+                BUDGET.check_time()
+                ys = y
+                for _ in range(min(batch, r - k)):
+                    y = (y * y + c) % n
+                    q = q * abs(x - y) % n
+                g = math.gcd(q, n)
+                k += batch
+            r *= 2
+        if g == n:
+            # Backtrack one step at a time from the last batch
+            g = 1
+            while g == 1:
+                BUDGET.tick()
+                ys = (ys * ys + c) % n
+                g = math.gcd(abs(x - ys), n)
+        if g != n:
+            return g
 
 
 def prime_factor(n):
     """Return the prime factorization of the number n as a list of tuples."""
-    primes = []
-    ls = []
     n = int(n)
-    if n == 1:
-        return []
     if n < 1:
         raise ValueError('prime factorization of nonpositive number')
-    x = 1
-    power = 0
-    while n % 2 == 0:
-        n //= 2
-        power += 1
-    if power > 0:
-        ls.append((2, power))
-    while n > 1:
-        x += 2
-        power = 0
-        is_prime = True
-        if x > 10000000:
-            raise ValueError('prime factorization of large number')
-        for a in primes:
-            if a * a > x:
-                is_prime = True
-                break
-            if x % a == 0:
-                is_prime = False
+    BUDGET.check_integer(n)
+    factors = dict()
+    # Trial division by small primes
+    for p in small_primes():
+        if p * p > n:
+            break
+        while n % p == 0:
+            n //= p
+            factors[p] = factors.get(p, 0) + 1
+    # Split the remaining large part
+    stack = [n] if n > 1 else []
+    while stack:
+        BUDGET.check_time()
+        m = stack.pop()
+        if is_prime(m):
+            factors[m] = factors.get(m, 0) + 1
+            continue
+        d = pollard_brent(m)
+        stack += [d, m // d]
+    return sorted(factors.items())
+
+
+class PrimeSieve:
+    """A segmented sieve of Eratosthenes with cached prime counts.
+
+    Segments store odd numbers only, one byte each, and are sieved on
+    demand; only the number of primes in every sieved segment is kept,
+    so counting up to 10^9 needs a few kilobytes of cache. The module is
+    loaded anew for every Calculator, so is the SIEVE instance below.
+    """
+
+    segment_size = 2 ** 21
+
+    def __init__(self):
+        """The initialiser of the class."""
+        self.base = []  # primes (except 2) for sieving the segments
+        self.base_limit = 0
+        self.counts = []  # number of primes in each segment, in order
+
+    def grow_base(self, n):
+        """Make sure the base primes cover all numbers below n."""
+        limit = math.isqrt(n) + 1
+        if limit > self.base_limit:
+            limit = max(limit, 2 * self.base_limit)
+            self.base = simple_sieve(limit + 1)[1:]
+            self.base_limit = limit
+
+    def segment(self, s):
+        """Return the sieved bytearray of segment s.
+
+        Index i of the array stands for the odd number start + 2i + 1.
+        """
+        start = s * self.segment_size
+        end = start + self.segment_size
+        self.grow_base(end)
+        seg = bytearray([1]) * (self.segment_size // 2)
+        if s == 0:
+            seg[0] = 0  # the number 1
+        for p in self.base:
+            if p * p >= end:
                 break
-        if not is_prime:
+            first = max(p * p, (start + p - 1) // p * p)
+            if first % 2 == 0:
+                first += p
+            i = (first - start - 1) // 2
+            seg[i::p] = bytes(len(range(i, len(seg), p)))
+        return seg
+
+    def count(self, s):
+        """Return the number of primes in segment s (cached)."""
+        while len(self.counts) <= s:
+            BUDGET.check_time()
+            n = len(self.counts)
+            self.counts.append(self.segment(n).count(1) + (n == 0))
+        return self.counts[s]
+
+    def pi(self, n):
+        """Return the number of primes not greater than n."""
+        if n < 2:
+            return 0
+        s, rest = divmod(n + 1, self.segment_size)
+        ans = sum(self.count(i) for i in range(s))
+        if rest:
+            ans += self.segment(s).count(1, 0, rest // 2) + (s == 0)
+        return ans
+
+    def nth(self, k):
+        """Return the k-th prime number."""
+        if k < 1:
+            raise ValueError('nthprime of a nonpositive number')
+        s = 0
+        while self.count(s) < k:
+            k -= self.count(s)
+            s += 1
+        for p in self.between(s * self.segment_size,
+                              (s + 1) * self.segment_size - 1):
+            k -= 1
+            if k == 0:
+                return p
+
+    def between(self, a, b):
+        """Yield all primes p with a <= p <= b, segment by segment."""
+        if a <= 2 <= b:
+            yield 2
+        a = max(a, 3)
+        for s in range(a // self.segment_size, b // self.segment_size + 1):
+            BUDGET.check_time()
+            start = s * self.segment_size
+            seg = self.segment(s)
+            lo = max(0, (a - start) // 2)
+            hi = min(len(seg), (b - start + 1) // 2)
+            for i in range(lo, hi):
+                if seg[i] and a <= start + 2 * i + 1:
+                    yield start + 2 * i + 1
+
+
+SIEVE = PrimeSieve()
+
+
+def prime_range(x, META):
+    """Return an array of the primes in a range.
+
+    The range is given by its bounds (a; b) or by an upper bound; the
+    bounds are separate arguments, so the range itself is never built.
+    """
+    if isinstance(x, META.Array):
+        raise ValueError('primes of an array (use primes(a; b))')
+    if isinstance(x, META.ArgList):
+        ls = list(x)
+        if len(ls) != 2:
+            raise ValueError('primes of more than two bounds')
+        a, b = sorted(ls)
+    else:
+        a, b = 2, x
+    a, b = math.ceil(a), math.floor(b)
+    ans = META.Array()
+    for p in SIEVE.between(a, b):
+        ans.ls.append(Decimal(p))
+        BUDGET.check_length(len(ans.ls))
+    return ans
+
+
+def prime_pi(x):
+    """Return the number of primes not greater than x."""
+    return Decimal(SIEVE.pi(math.floor(x)))
+
+
+def nth_prime(k):
+    """Return the k-th prime number."""
+    return Decimal(SIEVE.nth(to_natural(k, 'nthprime')))
+
+
+def next_prime(x):
+    """Return the smallest prime greater than x."""
+    n = int(x) + 1 if x >= 0 else 2
+    n = max(n, 2)
+    if n > 2 and n % 2 == 0:
+        n += 1
+    BUDGET.check_integer(n)
+    while not is_prime(n):
+        BUDGET.check_time()
+        n += 1 if n == 2 else 2
+    return Decimal(n)
+
+
+def is_prime_token(x):
+    """Return 1 if x is a prime number and 0 otherwise."""
+    if x != int(x):
+        return Decimal(0)
+    return Decimal(1) if is_prime(int(x)) else Decimal(0)
+
+
+def to_integers(args, name, META):
+    """Return the numbers of a gcd/lcm call as a list of ints.
+
+    The arguments may be numbers or arrays, the numbers of the arrays
+    are taken all together (gcd([12; 18]) = gcd(12; 18) = 6).
+    """
+    ans = []
+    stack = [args]
+    while stack:
+        arg = stack.pop()
+        if isinstance(arg, (META.Array, META.ArgList)):
+            stack += reversed(list(arg))
             continue
-        primes.append(x)
-        while n % x == 0:
-            n //= x
-            power += 1
-        if power != 0:
-            ls.append((x, power))
-        if x * x > n and n != 1:
-            ls.append((n, 1))
-            break
-    return ls
+        if arg != int(arg):
+            raise ValueError(f'{name} of a non-integer number')
+        ans.append(int(arg))
+    return ans
+
+
+def greatest_common_divisor(args, META):
+    """Return the greatest common divisor of the arguments."""
+    return Decimal(math.gcd(*to_integers(args, 'gcd', META)))
+
+
+def least_common_multiple(args, META):
+    """Return the least common multiple of the arguments."""
+    return Decimal(math.lcm(*to_integers(args, 'lcm', META)))
 
 
 def pretty_prime_factor(n):
@@ -94,13 +526,32 @@ def pretty_prime_factor(n):
     return ans
 
 
+# Options of the expensive tokens calculated on arrays in parallel
+parallel = {'array_input': True, 'pure': True, 'parallel': True}
+
 CLIC_TOKENS = [
-    [['mod'], lambda a, b: a % b, 'mul-tion oper', 'Modulo'],
-    [['!'], factorial, 'strong sign', 'Factorial', {'array_input': True}],
+    [['mod'], lambda a, b: a % b, 'mul-tion oper', 'Modulo',
+     {'pure': True}],
+    [['!'], factorial, 'strong sign', 'Factorial',
+     parallel],
     [['nPr'], permutations, 'normal func', 'Number of permutations',
-     {'array_input': True}],
+     parallel],
     [['nCr'], combinations, 'normal func', 'Number of combinations',
-     {'array_input': True}],
+     parallel],
     [['pf'], pretty_prime_factor, 'normal func', 'Prime factorization',
-     {'array_input': True}],
+     parallel],
+    [['isprime'], is_prime_token, 'normal func', 'Primality test',
+     parallel],
+    [['nextprime'], next_prime, 'normal func', 'Next prime number',
+     parallel],
+    [['primes'], prime_range, 'normal func', 'Primes from a to b (a; b)',
+     {'use_meta': True, 'pure': True}],
+    [['primepi'], prime_pi, 'normal func', 'Prime-counting function',
+     {'array_input': True, 'pure': True}],
+    [['nthprime'], nth_prime, 'normal func', 'The n-th prime number',
+     {'array_input': True, 'pure': True}],
+    [['gcd'], greatest_common_divisor, 'normal func',
+     'Greatest common divisor', {'use_meta': True, 'pure': True}],
+    [['lcm'], least_common_multiple, 'normal func',
+     'Least common multiple', {'use_meta': True, 'pure': True}],
 ]
@@ -0,0 +1,99 @@
+"""Module for loading data from files."""
+
+from decimal import Decimal, InvalidOperation
+import mmap
+import os
+
+from clic.budget import BUDGET
+
+
+DELIMITERS = ',;\t'
+
+
+def open_lines(path):
+    """Yield the lines of a file (as bytes) through a memory map."""
+    path = os.path.expanduser(path)
+    with open(path, 'rb') as file:
+        # Empty files cannot be memory-mapped
+        if os.fstat(file.fileno()).st_size == 0:
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield from iter(mm.readline, b'')
+
+
+def find_delimiter(line):
+    """Return the delimiter used in a line of a CSV file."""
+    for delimiter in DELIMITERS:
+        if delimiter in line:
+            return delimiter.encode()
+    return None
+
+
+def read_column(path, column=None):
+    """Return a list of numbers stored in a column of a file.
+
+    Arguments:
+    path -- the path to a CSV file or a file with a number on each line,
+    column -- the column number (starting from 1) or the column name.
+    """
+    lines = open_lines(path)
+    first = next(lines, b'')
+    delimiter = find_delimiter(first.decode())
+    header = first.split(delimiter) if delimiter else [first]
+    header = [name.strip().strip(b'"').decode() for name in header]
+    if column is None:
+        index = 0
+    elif isinstance(column, str):
+        if column not in header:
+            raise ValueError(f"no column named '{column}'")
+        index = header.index(column)
+    else:
+        index = int(column) - 1
+        if index < 0:
+            raise ValueError('column numbers start from 1')
+    ans = []
+    try:
+        ans.append(Decimal(header[index]))
+    except (InvalidOperation, IndexError):
+        pass  # The first line is a header
+    for i, line in enumerate(lines, start=2):
+        BUDGET.tick()
+        if delimiter:
+            fields = line.split(delimiter)
+            if len(fields) <= index:
+                if not line.strip():
+                    continue
+                raise ValueError(f'missing column on line {i}')
+            field = fields[index]
+        else:
+            field = line
+        if not field.strip():
+            continue
+        try:
+            ans.append(Decimal(field.decode()))
+        except InvalidOperation:
+            raise ValueError(f'invalid number on line {i}')
+    return ans
+
+
+def load(args, META):
+    """Load a column of a data file into an array.
+
+    Accepts load("file.txt") and load("file.csv"; column).
+    """
+    if type(args).__name__ == 'ArgList':
+        path, column = tuple(args)
+    else:
+        path, column = args, None
+    if not isinstance(path, str):
+        raise ValueError('the file name must be a string')
+    array = META.Array()
+    array.ls = read_column(path, column)
+    BUDGET.check_length(len(array.ls))
+    return array
+
+
+CLIC_TOKENS = [
+    [['load'], load, 'normal func', 'Load numbers from a file',
+     {'use_meta': True}],
+]
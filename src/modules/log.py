@@ -23,8 +23,8 @@ def ln_exp(a, b):
 
 
 CLIC_TOKENS = [
-    [['log'], logarithm, 'normal func', 'Logarithm'],
-    [['log ^'], log_exp, 'normal doub', 'Logarithm'],
-    [['ln'], lambda a: a.ln(), 'normal func', ''],
-    [['ln ^'], ln_exp,         'normal doub', ''],
+    [['log'], logarithm, 'normal func', 'Logarithm', {'pure': True}],
+    [['log ^'], log_exp, 'normal doub', 'Logarithm', {'pure': True}],
+    [['ln'], lambda a: a.ln(), 'normal func', '', {'pure': True}],
+    [['ln ^'], ln_exp,         'normal doub', '', {'pure': True}],
 ]
@@ -6,11 +6,13 @@ from decimal import Decimal
 # Helper functions
 
 def lazy_quantity(*args, **kwargs):
-    """Return a function that will create a new quantity when called."""
+    """Return a function that will create a quantity when first called."""
+    cache = []
 
     def give_quantity(META):
-        quantity = META.Quantity(*args, **kwargs)
-        return quantity
+        if not cache:
+            cache.append(META.Quantity(*args, **kwargs))
+        return cache[0]
 
     return give_quantity
 
@@ -87,26 +89,30 @@ mile = lazy_quantity(Decimal("1609.344"), units={'m': 1})
 pound = lazy_quantity(Decimal("0.45359237"), units={'kg': 1})
 
 
+# Options of the tokens that can be calculated in advance
+pure = {'pure': True}
+pure_meta = {'use_meta': True, 'pure': True}
+
 CLIC_TOKENS = [
     [['degF', '°F'], absolute_fahrenheit, 'strong sign',
-     'Absolute temperature in degrees Fahrenheit', {'use_meta': True}],
+     'Absolute temperature in degrees Fahrenheit', pure_meta],
     [['degC', '°C'], absolute_celcius, 'strong sign',
-     'Absolute temperature in degrees Celcius', {'use_meta': True}],
+     'Absolute temperature in degrees Celcius', pure_meta],
     [['Fdeg', 'F°'], delta_fahrenheit, 'static var',
-     'Temperature change in degrees Fahrenheit', {'use_meta': True}],
+     'Temperature change in degrees Fahrenheit', pure_meta],
     [['Cdeg', 'C°'], delta_celcius, 'static var',
-     'Temperature change in degrees Celcius', {'use_meta': True}],
+     'Temperature change in degrees Celcius', pure_meta],
     [['to_degF', 'to°F'], to_absolute_fahrenheit, 'light sign',
-     'To absolute temperature in degrees Fahrenheit'],
+     'To absolute temperature in degrees Fahrenheit', pure],
     [['to_degC', 'to°C'], to_absolute_celcius, 'light sign',
-     'To absolute temperature in degrees Celcius'],
+     'To absolute temperature in degrees Celcius', pure],
     [['to_Fdeg', 'toF°'], to_delta_fahrenheit, 'light sign',
-     'To temperature change in degrees Fahrenheit'],
+     'To temperature change in degrees Fahrenheit', pure],
     [['to_Cdeg', 'toC°'], to_delta_celcius, 'light sign',
-     'To temperature change in degrees Celcius'],
-    [['in'], inch, 'static var', 'One inch', {'use_meta': True}],
-    [['ft'], foot, 'static var', 'One foot', {'use_meta': True}],
-    [['yd'], yard, 'static var', 'One yard', {'use_meta': True}],
-    [['mi'], mile, 'static var', 'One mile', {'use_meta': True}],
-    [['lb'], pound, 'static var', 'One pound', {'use_meta': True}],
+     'To temperature change in degrees Celcius', pure],
+    [['in'], inch, 'static var', 'One inch', pure_meta],
+    [['ft'], foot, 'static var', 'One foot', pure_meta],
+    [['yd'], yard, 'static var', 'One yard', pure_meta],
+    [['mi'], mile, 'static var', 'One mile', pure_meta],
+    [['lb'], pound, 'static var', 'One pound', pure_meta],
 ]
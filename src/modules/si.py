@@ -6,26 +6,35 @@ D = Decimal
 
 
 def lazy_quantity(*args, **kwargs):
-    """Return a function that will create a new quantity when called."""
+    """Return a function that will create a quantity when first called."""
+    cache = []
 
     def give_quantity(META):
-        quantity = META.Quantity(*args, **kwargs)
-        return quantity
+        if not cache:
+            cache.append(META.Quantity(*args, **kwargs))
+        return cache[0]
 
     return give_quantity
 
 
 CLIC_TOKENS = []
 
-prefixes = {-9: 'n', -6: 'mc', -3: 'm', -2: 'c', -1: 'd',
-            0: '', 1: 'da', 2: 'h', 3: 'k', 6: 'M', 9: 'G'}
+# Prefixed units (e.g. 'kN') are not tokens; they are resolved on demand
+# from these tables by resolve_prefix.
+PREFIXES = {'n': -9, 'mc': -6, 'μ': -6, 'm': -3, 'c': -2, 'd': -1,
+            'da': 1, 'h': 2, 'k': 3, 'M': 6, 'G': 9}
 
 verbal = {-9: 'nano', -6: 'micro', -3: 'milli', -2: 'centi', -1: 'deci',
           0: '', 1: 'deca', 2: 'hecto', 3: 'kilo', 6: 'mega', 9: 'giga'}
 
+# {name: (ht, numerical, units, exps, ht_overwrite)}
+UNITS = dict()
+# {name: list of allowed prefixes}, shown by the 'list' command
+CLIC_PREFIXES = dict()
+
 
 def si(ht, numerical, units, names, exps=None, ht_overwrite=None):
-    """Append SI units to the exporttokens list of the module.
+    """Register SI units and their allowed prefixes.
 
     Arguments:
     numerical -- the numerical part of the quantity,
@@ -39,29 +48,46 @@ def si(ht, numerical, units, names, exps=None, ht_overwrite=None):
         units = dict(zip(('kg', 'm', 's', 'A'), units))
     if not exps:
         exps = [-9, -6, -3, 0, 3, 6, 9]
-    for exp in exps:
-        new_names = [prefixes[exp] + name for name in names]
-        new_numerical = numerical * (Decimal('10') ** exp)
-        new_ht = 'One ' + verbal[exp] + ht
-        if ht_overwrite:
-            new_ht = ht_overwrite
+    prefixed = [
+        prefix for prefix, exp in PREFIXES.items()
+        if exp in exps and exp != 0
+    ]
+    for name in names:
+        UNITS[name] = (ht, numerical, units, exps, ht_overwrite)
+        if prefixed:
+            CLIC_PREFIXES[name] = prefixed
+    if 0 in exps:
+        new_ht = ht_overwrite or 'One ' + ht
+        if prefixed:
+            new_ht += ' (prefixes: ' + ', '.join(prefixed) + ')'
         CLIC_TOKENS.append([
-            new_names,
-            lazy_quantity(new_numerical, units=units),
+            names,
+            lazy_quantity(numerical, units=units),
             'static var',
             new_ht,
-            {'use_meta': True}
+            {'use_meta': True, 'pure': True}
         ])
-        # Alternative micro prefix
-        if exp == -6:
-            new_names = ['μ' + name for name in names]
-            CLIC_TOKENS.append([
-                new_names,
-                lazy_quantity(new_numerical, units=units),
-                'static var',
-                new_ht,
-                {'use_meta': True}
-            ])
+
+
+def resolve_prefix(word):
+    """Return the token arguments for a prefixed unit (or None).
+
+    For example, 'kN' is resolved to one kilonewton.
+    """
+    for prefix, exp in PREFIXES.items():
+        if not word.startswith(prefix) or word[len(prefix):] not in UNITS:
+            continue
+        ht, numerical, units, exps, ht_overwrite = UNITS[word[len(prefix):]]
+        if exp not in exps:
+            continue
+        return [
+            [word],
+            lazy_quantity(numerical.scaleb(exp), units=units),
+            'static var',
+            ht_overwrite or 'One ' + verbal[exp] + ht,
+            {'use_meta': True, 'pure': True}
+        ]
+    return None
 
 
 # Add SI units
@@ -97,6 +123,11 @@ si('hour',   D('3600'),     {'s': 1}, ['hr'],   [0])
 si('day',    D('86400'),    {'s': 1}, ['day'],  [0])
 si('year',   D('31557600'), {'s': 1}, ['year'], [0])
 
+CLIC_RESOLVER = resolve_prefix
+
+# Derived units that results are displayed in (when enabled)
+CLIC_DISPLAY_UNITS = ['N', 'J', 'W', 'Pa', 'C', 'V', 'Ω']
+
 CLIC_MAPPINGS = {
     'ohm': 'Ω', 'micro': 'μ',
 }
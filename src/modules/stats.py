@@ -1,8 +1,13 @@
 """Module with statistics functions."""
 
 from decimal import Decimal
+from functools import lru_cache
 from math import prod
-import math
+from statistics import NormalDist
+import decimal
+import random
+
+from clic.budget import BUDGET
 
 
 def plus_or_minus(a, b=None, META=None):
@@ -37,35 +42,135 @@ def push(array, element):
         return ans
 
 
+class Moments:
+    """A one-pass accumulator of count, sum and sum of squares.
+
+    The sums are accumulated exactly (in a context with maximum precision),
+    so the derived statistics are rounded only once and no intermediate
+    arrays are created.
+    """
+
+    def __init__(self, data=()):
+        """The initialiser of the class."""
+        self.n = 0
+        self.total = None
+        self.squares = None
+        self.update(data)
+
+    def update(self, data):
+        """Add all elements of data to the accumulator."""
+        with decimal.localcontext() as ctx:
+            ctx.prec = decimal.MAX_PREC
+            ctx.Emax = decimal.MAX_EMAX
+            ctx.Emin = decimal.MIN_EMIN
+            for x in data:
+                if self.n == 0:
+                    self.total, self.squares = x, x * x
+                else:
+                    self.total += x
+                    self.squares += x * x
+                self.n += 1
+
+    def mean(self):
+        """Return the arithmetic mean."""
+        return self.total / self.n
+
+    def variance(self):
+        """Return the (population) variance."""
+        with decimal.localcontext() as ctx:
+            ctx.prec = decimal.MAX_PREC
+            numerator = self.squares * self.n - self.total * self.total
+        return numerator / (self.n * self.n)
+
+
+def is_array(a):
+    return type(a).__name__ in ['Array', 'ArgList']
+
+
 def mean(a):
-    if type(a).__name__ in ['Array', 'ArgList']:
-        return sum(a) / len(a)
+    if is_array(a):
+        return Moments(a).mean()
     return Decimal('0')
 
 
 def array_sort(a, META):
-    if type(a).__name__ in ['Array', 'ArgList']:
+    if is_array(a):
         return META.Array(*sorted(list(a)))
     raise TypeError('Cannot sort anything but arrays')
 
 
+def select(ls, k):
+    """Return the k-th smallest element of ls (from 0) in O(n) on average."""
+    while True:
+        pivot = random.choice(ls)
+        lower = [x for x in ls if x < pivot]
+        if k < len(lower):
+            ls = lower
+            continue
+        k -= len(lower)
+        equal = sum(1 for x in ls if x == pivot)
+        if k < equal:
+            return pivot
+        k -= equal
+        ls = [x for x in ls if x > pivot]
+
+
+def select_pair(ls, k):
+    """Return the k-th and (k+1)-th smallest elements of ls."""
+    a = select(ls, k)
+    if k + 1 >= len(ls) or sum(1 for x in ls if x <= a) > k + 1:
+        return a, a
+    return a, min(x for x in ls if x > a)
+
+
 def median(array):
-    if type(array).__name__ in ['Array', 'ArgList']:
-        ls = sorted(list(array))
-        a = len(array)
+    if is_array(array):
+        ls = list(array)
+        a = len(ls)
         if a % 2 == 0:
-            return (ls[a // 2 - 1] + ls[a // 2]) / 2
+            lower, upper = select_pair(ls, a // 2 - 1)
+            return (lower + upper) / 2
         else:
-            return ls[a // 2]
+            return select(ls, a // 2)
     return Decimal('0')
 
 
+def quantile_of(array, q):
+    """Return the q-quantile of array (linear interpolation)."""
+    ls = list(array)
+    if not ls:
+        raise ValueError('quantile of an empty array')
+    if not 0 <= q <= 1:
+        raise ValueError('quantile out of range')
+    h = (len(ls) - 1) * q
+    k = int(h)
+    lower, upper = select_pair(ls, k)
+    if h == k or lower == upper:
+        return lower
+    return lower + (upper - lower) * (h - k)
+
+
+def quantile(args):
+    """Return the quantile of an array (e.g. Quantile([...]; 0.25))."""
+    array, q = tuple(args)
+    return quantile_of(array, q)
+
+
+def percentile(args):
+    """Return the percentile of an array (e.g. Percentile([...]; 90))."""
+    array, p = tuple(args)
+    return quantile_of(array, p / Decimal('100'))
+
+
 def variance(array):
-    return mean((mean(array) - array) ** Decimal('2'))
+    return Moments(array).variance()
 
 
 def deviation(array):
-    return variance(array) ** Decimal('0.5')
+    var = variance(array)
+    if isinstance(var, Decimal):
+        return var.sqrt()
+    return var ** Decimal('0.5')
 
 
 def deviation_exp(a, b):
@@ -73,47 +178,214 @@ def deviation_exp(a, b):
     return deviation(b) ** a
 
 
+# Below this bound erf is summed as a series, above it erfc is computed
+# as a continued fraction
+ERF_SERIES_BOUND = 3
+GUARD_DIGITS = 10
+
+
+@lru_cache(maxsize=None)
+def normal_constants(prec):
+    """Return 2/sqrt(pi), 1/sqrt(pi) and sqrt(2) to prec digits.
+
+    The constants are cached per precision, so that evaluating the normal
+    distribution over an array only computes them once.
+    """
+    with decimal.localcontext() as ctx:
+        ctx.prec = prec + 2
+        # Pi by the series from the decimal module documentation
+        lasts, t, pi, n, na, d, da = 0, Decimal(3), 3, 1, 0, 0, 24
+        while pi != lasts:
+            lasts = pi
+            n, na = n + na, na + 8
+            d, da = d + da, da + 32
+            t = (t * n) / d
+            pi += t
+        sqrt_pi = pi.sqrt()
+        ctx.prec = prec
+        return +(2 / sqrt_pi), +(1 / sqrt_pi), +Decimal(2).sqrt()
+
+
+def erf_series(x, prec):
+    """Return erf(x) for a small x.
+
+    Uses erf(x) = 2/sqrt(pi) exp(-x^2) sum(2^n x^(2n+1) / (2n+1)!!),
+    which has no alternating terms.
+    """
+    two_over_sqrt_pi = normal_constants(prec)[0]
+    x2 = x * x
+    term = total = x
+    n = 0
+    while True:
+        BUDGET.tick()
+        n += 1
+        term = term * 2 * x2 / (2 * n + 1)
+        new = total + term
+        if new == total:
+            break
+        total = new
+    return two_over_sqrt_pi * (-x2).exp() * total
+
+
+def erfc_fraction(x, prec):
+    """Return erfc(x) for a large positive x (continued fraction).
+
+    erfc(x) = exp(-x^2) / sqrt(pi) / (x + 1/2 / (x + 1 / (x + 3/2 / ...))),
+    evaluated with the modified Lentz algorithm.
+    """
+    one_over_sqrt_pi = normal_constants(prec)[1]
+    tiny = Decimal(10) ** (-2 * prec)
+    eps = Decimal(10) ** (-prec)
+    f = c = x
+    d = Decimal(0)
+    k = 0
+    while True:
+        k += 1
+        a = Decimal(k) / 2
+        d = x + a * d
+        d = 1 / (d if d else tiny)
+        c = x + a / c
+        c = c if c else tiny
+        delta = c * d
+        f *= delta
+        if abs(delta - 1) < eps or k > 10000:
+            break
+    return one_over_sqrt_pi * (-x * x).exp() / f
+
+
+def erf(x):
+    """Return the error function of x at the current precision."""
+    if not x:
+        return Decimal(0)
+    prec = decimal.getcontext().prec
+    with decimal.localcontext() as ctx:
+        ctx.prec = prec + GUARD_DIGITS
+        if abs(x) < ERF_SERIES_BOUND:
+            ans = erf_series(x, ctx.prec)
+        else:
+            ans = (1 - erfc_fraction(abs(x), ctx.prec)).copy_sign(x)
+    return +ans
+
+
+def erfc(x):
+    """Return the complementary error function of x."""
+    prec = decimal.getcontext().prec
+    with decimal.localcontext() as ctx:
+        ctx.prec = prec + GUARD_DIGITS
+        if x >= ERF_SERIES_BOUND:
+            ans = erfc_fraction(x, ctx.prec)
+        elif x <= -ERF_SERIES_BOUND:
+            ans = 2 - erfc_fraction(-x, ctx.prec)
+        else:
+            # erfc(x) >= erfc(3) ~ 2e-5, so the guard digits are enough
+            ans = 1 - erf_series(x, ctx.prec)
+    return +ans
+
+
 def normalcdf_phi(x):
-    return (
-        Decimal('1') + Decimal(math.erf(x / Decimal('2') ** Decimal('0.5')))
-    ) / Decimal('2')
+    """Return the standard normal cumulative distribution at x."""
+    prec = decimal.getcontext().prec
+    with decimal.localcontext() as ctx:
+        ctx.prec = prec + GUARD_DIGITS
+        sqrt2 = normal_constants(ctx.prec)[2]
+        # Phi(x) = erfc(-x / sqrt(2)) / 2, accurate in both tails
+        ans = erfc(-x / sqrt2) / 2
+    return +ans
 
 
-def normalcdf(array):
-    """Find the cumulative distribution for the standard normal distr."""
-    minx, maxx = tuple(array)
+def normalcdf(args):
+    """Find the cumulative distribution for the normal distribution.
+
+    Accepts normalcdf(x), normalcdf(a; b) and normalcdf(a; b; mu; sigma).
+    """
+    if type(args).__name__ != 'ArgList':
+        return normalcdf_phi(args)
+    args = list(args)
+    if len(args) == 2:
+        (minx, maxx), (mu, sigma) = args, (Decimal(0), Decimal(1))
+    elif len(args) == 4:
+        minx, maxx, mu, sigma = args
+    else:
+        raise ValueError('normalcdf takes 1, 2 or 4 arguments')
+    if sigma <= 0:
+        raise ValueError('nonpositive standard deviation')
+    minx, maxx = (minx - mu) / sigma, (maxx - mu) / sigma
     return abs(normalcdf_phi(maxx) - normalcdf_phi(minx))
 
 
+def invnorm(args):
+    """Return the inverse of the normal cumulative distribution.
+
+    Accepts invnorm(p) and invnorm(p; mu; sigma).
+    """
+    if type(args).__name__ == 'ArgList':
+        p, mu, sigma = tuple(args)
+    else:
+        p, mu, sigma = args, Decimal(0), Decimal(1)
+    if not 0 < p < 1:
+        raise ValueError('probability out of range')
+    prec = decimal.getcontext().prec
+    with decimal.localcontext() as ctx:
+        ctx.prec = prec + GUARD_DIGITS
+        sqrt2 = normal_constants(ctx.prec)[2]
+        one_over_sqrt_pi = normal_constants(ctx.prec)[1]
+        # A double precision start, refined by Newton's method
+        x = Decimal(NormalDist().inv_cdf(float(p)))
+        for _ in range(10):
+            pdf = one_over_sqrt_pi / sqrt2 * (-x * x / 2).exp()
+            step = (normalcdf_phi(x) - p) / pdf
+            x -= step
+            if abs(step) <= abs(x).scaleb(-prec - 2):
+                break
+        ans = mu + sigma * x
+    return +ans
+
+
 array_from_range = (lambda a, b, META: META.Array.from_range(a, b))
 
 
+# Options of the tokens that can be calculated in advance
+pure = {'pure': True}
+pure_meta = {'use_meta': True, 'pure': True}
+pure_array = {'array_input': True, 'pure': True}
+
 CLIC_TOKENS = [
     [['±', 'pm'], plus_or_minus, 'addition oper', 'Plus-or-minus',
-     {'use_meta': True}],
+     pure_meta],
     [[' ±', ' pm'], plus_or_minus, 'strong func', 'Positive-or-negative',
-     {'use_meta': True}],
+     pure_meta],
     [['∓', 'mp'], minus_or_plus, 'addition oper', 'Plus-or-minus',
-     {'use_meta': True}],
+     pure_meta],
     [[' ∓', ' mp'], minus_or_plus, 'strong func', 'Positive-or-negative',
-     {'use_meta': True}],
+     pure_meta],
     [['SORT'], array_sort,   'normal func', 'Sorted version of array',
-     {'use_meta': True}],
-    [['PUSH'], push,       'mul-tion oper', 'Push element to array'],
-    [['Σ', 'Sum'], sum,    'mul-tion func', 'Sum of array elements'],
-    [['Π', 'Prod'], prod,  'mul-tion func', 'Product of array elements'],
-    [['Len'], len,           'normal func', 'Number of array elements'],
-    [['Min'], min,           'normal func', 'Minimal value'],
-    [['Max'], max,           'normal func', 'Maximum value'],
-    [['Avg'], mean,          'normal func', 'Arithmetic mean'],
-    [['Median'], median,     'normal func', 'Median'],
-    [['Variance'], variance, 'normal func', 'Variance'],
-    [['σ', 'Deviation'], deviation, 'normal func', 'Standard deviation'],
-    [['normalcdf'], normalcdf,      'normal func', 'Cumulative distribution'],
+     pure_meta],
+    [['PUSH'], push,       'mul-tion oper', 'Push element to array', pure],
+    [['Σ', 'Sum'], sum,    'mul-tion func', 'Sum of array elements', pure],
+    [['Π', 'Prod'], prod,  'mul-tion func', 'Product of array elements',
+     pure],
+    [['Len'], len,           'normal func', 'Number of array elements', pure],
+    [['Min'], min,           'normal func', 'Minimal value', pure],
+    [['Max'], max,           'normal func', 'Maximum value', pure],
+    [['Avg'], mean,          'normal func', 'Arithmetic mean', pure],
+    [['Median'], median,     'normal func', 'Median', pure],
+    [['Quantile'], quantile, 'normal func', 'Quantile (from 0 to 1)', pure],
+    [['Percentile'], percentile, 'normal func', 'Percentile', pure],
+    [['Variance'], variance, 'normal func', 'Variance', pure],
+    [['σ', 'Deviation'], deviation, 'normal func', 'Standard deviation',
+     pure],
+    [['normalcdf'], normalcdf, 'normal func', 'Cumulative distribution',
+     pure_array],
+    [['invnorm'], invnorm, 'normal func', 'Inverse normal distribution',
+     pure_array],
+    [['erf'], erf,   'normal func', 'Error function', pure_array],
+    [['erfc'], erfc, 'normal func', 'Complementary error function',
+     pure_array],
     [['..'], array_from_range, 'strong oper', 'Create array by range',
-        {'use_meta': True}],
+        pure_meta],
     [['['], create_array, 'static open', 'Array', {'closes': ']',
-                                                   'use_meta': True}],
+                                                   'use_meta': True,
+                                                   'pure': True}],
     [[']'], lambda: None, 'static clos', 'Array', {'closes': '['}],
 ]
 
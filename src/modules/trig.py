@@ -82,7 +82,7 @@ def radian(META):
     return META.Quantity(Decimal(1), {'rad': 1})
 
 
-flag = {'use_meta': True, 'array_input': True}
+flag = {'use_meta': True, 'array_input': True, 'pure': True}
 
 
 CLIC_TOKENS = [
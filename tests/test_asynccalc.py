@@ -0,0 +1,30 @@
+"""Tests of the asynchronous calculator."""
+
+import asyncio
+
+from clic.asynccalc import AsyncCalculator
+
+
+def test_quantity_round_trip():
+    """Quantities calculated by the worker keep their units."""
+    async def calculate():
+        calc = AsyncCalculator()
+        assert await calc.evaluate('x = 5 m') == (False, '5 m')
+        assert await calc.evaluate('x + 1 m') == (False, '6 m')
+        # The dimensionless quantities of the parent are not changed
+        calc.calculator.calculate('(2 m) : (2 m)')
+        assert calc.get_answer() == (False, '1')
+
+    asyncio.run(calculate())
+
+
+def test_timeout_keeps_variables():
+    """An aborted calculation leaves the variables unchanged."""
+    async def calculate():
+        calc = AsyncCalculator()
+        await calc.evaluate('x = 2 m')
+        flag, _ = await calc.evaluate('x = Sum (1..10^8)^2', timeout=0.5)
+        assert flag
+        assert await calc.evaluate('x') == (False, '2 m')
+
+    asyncio.run(calculate())
@@ -0,0 +1,55 @@
+"""Tests of the calculation budget."""
+
+import copy
+import time
+
+import pytest
+
+from clic.budget import Budget, BudgetError
+from clic.calculator import Calculator
+from clic.config import CONFIG
+
+
+def calculate(expr, **limits):
+    """Return the answer of expr calculated with the given limits."""
+    config = copy.deepcopy(CONFIG)
+    config['budget'] |= limits
+    calc = Calculator(config=config)
+    calc.calculate(expr)
+    return calc.get_answer()
+
+
+@pytest.mark.parametrize('expr, limits, error', [
+    ('200!', {'digits': 100}, 'integer longer than 100 digits'),
+    ('1..1000', {'array_length': 100}, 'array longer than 100 elements'),
+    ('1 + 2 + 3', {'calls': 2}, 'too many operations'),
+])
+def test_limits(expr, limits, error):
+    """Calculations exceeding a limit fail."""
+    assert calculate(expr, **limits) == (True, error)
+
+
+def test_digits_of_approximate_results():
+    """Results calculated via log-gamma are not exact integers."""
+    flag, _ = calculate('1000000!', digits=100)
+    assert not flag
+
+
+def test_time_limit_of_slow_loops():
+    """The time is checked often enough in loops with slow steps."""
+    start = time.monotonic()
+    assert calculate('sin(10^10)', time=0.5) \
+        == (True, 'calculation took longer than 0.5 s')
+    assert time.monotonic() - start < 1.5
+
+
+def test_slow_ticks_are_checked_often():
+    """The number of ticks between the time checks adapts."""
+    budget = Budget()
+    budget.start(time_limit=0.2)
+    start = time.monotonic()
+    with pytest.raises(BudgetError):
+        while True:
+            budget.tick()
+            time.sleep(0.005)
+    assert time.monotonic() - start < 0.4
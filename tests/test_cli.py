@@ -0,0 +1,46 @@
+"""Tests of the command line calculation."""
+
+import json
+import os
+import subprocess
+import sys
+
+from clic import cli
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'src')
+
+
+def clic(*args, home):
+    """Run clic with args and return the completed process."""
+    env = dict(os.environ, HOME=str(home), PYTHONPATH=SRC)
+    return subprocess.run(
+        [sys.executable, '-m', 'clic', *args], env=env,
+        capture_output=True, text=True, timeout=60,
+    )
+
+
+def test_answer(tmp_path):
+    """Answers are printed to stdout."""
+    done = clic('2 + 2', home=tmp_path)
+    assert (done.returncode, done.stdout, done.stderr) == (0, '4\n', '')
+
+
+def test_error(tmp_path):
+    """Errors are printed to stderr with a failing exit status."""
+    done = clic('--format', 'raw', 'foo', home=tmp_path)
+    assert done.returncode == 1
+    assert (done.stdout, done.stderr) == ('', 'unknown name: foo\n')
+
+
+def test_json_error(tmp_path):
+    """Errors are JSON objects in the JSON format."""
+    done = clic('--format', 'json', 'foo', home=tmp_path)
+    assert done.returncode == 1
+    assert json.loads(done.stdout) == {'error': 'unknown name: foo'}
+
+
+def test_completion_of_commands():
+    """The commands of the prompt are completed."""
+    completer = cli.create_completer(dict(), cli.COMMANDS)
+    for command in cli.COMMANDS:
+        assert completer(command[:-1], 0) == command + ' '
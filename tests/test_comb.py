@@ -0,0 +1,43 @@
+"""Tests of the combinatorics and number theory module."""
+
+import pytest
+
+from clic.calculator import Calculator
+
+
+@pytest.fixture(scope='module')
+def calc():
+    return Calculator()
+
+
+@pytest.mark.parametrize('expr, answer', [
+    # A strong pseudoprime to all the Miller-Rabin bases
+    ('isprime(3317044064679887385961981)', '0'),
+    # The Mersenne primes 2^89 - 1 and 2^107 - 1
+    ('isprime(618970019642690137449562111)', '1'),
+    ('isprime(162259276829213363391578010288127)', '1'),
+    ('gcd([12; 18])', '6'),
+    ('gcd(12; 18)', '6'),
+    ('lcm([4; 6]; 10)', '60'),
+    ('primes(20)', '2\n3\n5\n7\n11\n13\n17\n19'),
+    ('primes(20; 10)', '11\n13\n17\n19'),
+    # Across the first segment boundary (2^21)
+    ('primes(2097130; 2097190)', '2097131\n2097133\n2097143\n2097169'),
+    ('primepi(1)', '0'),
+    ('primepi(100)', '25'),
+    ('primepi(10^6)', '78498'),
+    ('primepi(2097169) - primepi(2097130)', '4'),
+    ('nthprime(1)', '2'),
+    ('nthprime(1000)', '7919'),
+    ('nthprime(78498)', '999983'),
+])
+def test_answers(calc, expr, answer):
+    """Primality, gcd/lcm of arrays and the prime sieve."""
+    calc.calculate(expr)
+    assert calc.get_answer('raw') == (False, answer)
+
+
+def test_primes_of_array(calc):
+    """Ranges of primes are given by bounds, not by a range array."""
+    calc.calculate('primes(10..20)')
+    assert calc.get_answer() == (True, 'primes of an array (use primes(a; b))')
@@ -0,0 +1,53 @@
+"""Tests of the unit conversion ('to')."""
+
+import pytest
+
+from clic.calculator import Calculator
+
+
+@pytest.fixture
+def calc():
+    return Calculator()
+
+
+def answer(calc, expr):
+    """Return the answer of an expression."""
+    calc.calculate(expr)
+    return calc.get_answer()
+
+
+def test_round_trip(calc):
+    """Converting there and back gives the original quantity."""
+    assert answer(calc, 'x = 1 km to mi') \
+        == (False, '621.3711922373339696174342 * 10^-3 mi')
+    assert answer(calc, 'x to km') == (False, '1 km')
+    assert answer(calc, '1 h to s') == (False, '3.6 * 10^3 s')
+    assert answer(calc, '5 N to kg m/s^2') == (False, '5 kg m/s^2')
+
+
+def test_variables_keep_display(calc):
+    """A converted variable is shown in its unit when read again."""
+    answer(calc, 'x = 1 km to mi')
+    assert answer(calc, 'x') \
+        == (False, '621.3711922373339696174342 * 10^-3 mi')
+    # Calculations with it show the base units
+    assert answer(calc, 'x + 0 m') == (False, '10^3 m')
+
+
+def test_reactive_conversion(calc):
+    """Reactive variables are converted when they are updated."""
+    answer(calc, 'q = 3 m')
+    answer(calc, 'w := q to km')
+    answer(calc, 'q = 4 m')
+    assert answer(calc, 'w') == (False, '4 * 10^-3 km')
+
+
+@pytest.mark.parametrize('expr, error', [
+    ('1 m to s', 'conversion to different units'),
+    ('3 to m', 'conversion of a plain number'),
+    ('300 K to °C', 'offset units cannot be converted'),
+    ('300 K to degF', 'offset units cannot be converted'),
+])
+def test_errors(calc, expr, error):
+    """Impossible conversions give clear errors."""
+    assert answer(calc, expr) == (True, error)
@@ -0,0 +1,43 @@
+"""Tests of the normal distribution functions of the statistics module."""
+
+from decimal import Decimal
+
+import pytest
+
+from clic.calculator import Calculator
+
+
+@pytest.fixture(scope='module')
+def calc():
+    return Calculator()
+
+
+def answer(calc, expr):
+    """Return the answer of an expression (in the raw format)."""
+    calc.calculate(expr)
+    flag, ans = calc.get_answer('raw')
+    assert not flag, ans
+    return ans
+
+
+@pytest.mark.parametrize('expr, ans', [
+    ('erf(0.5)', '0.520499877813046537682746653891964528736'),
+    ('erf(1)', '0.842700792949714869341220635082609259296'),
+    ('erf(-1)', '-0.842700792949714869341220635082609259296'),
+    ('erfc(5)', '1.53745979442803485018834348538337889011E-12'),
+    ('normalcdf(-1; 1)', '0.682689492137085897170465091264075844955'),
+    ('normalcdf(0)', '0.5'),
+    ('invnorm(0.975)', '1.95996398454005423552459443052055152795'),
+    ('invnorm(0.5; 10; 2)', '10'),
+])
+def test_normal_distribution(calc, expr, ans):
+    """The normal distribution agrees with reference values."""
+    ans = Decimal(ans)
+    error = abs(Decimal(answer(calc, expr)) - ans)
+    assert error <= abs(ans).scaleb(-20) or error < Decimal('1E-30')
+
+
+def test_normal_distribution_of_arrays(calc):
+    """The functions are calculated elementwise on arrays."""
+    assert answer(calc, 'erf [0; 1]') \
+        == '0\n' + answer(calc, 'erf(1)')
@@ -0,0 +1,49 @@
+"""Tests of the expression optimizer."""
+
+import copy
+
+from clic.calculator import Calculator
+from clic.config import CONFIG
+
+
+def test_failed_fold_is_not_repeated():
+    """A constant subtree that raises is calculated once by fold."""
+    calc = Calculator()
+    calls = []
+    fold = calc.fold
+
+    def counting_fold(ls):
+        calls.append(ls)
+        return fold(ls)
+
+    calc.fold = counting_fold
+    calc.calculate('1 + (2 * (3 + (4 : 0)))')
+    assert calc.get_answer()[0]
+    assert len(calls) == 1
+
+
+def test_folded_tokens_are_reported():
+    """Hooks see the token calls of folded constants."""
+    calc = Calculator()
+    names = []
+    calc.hooks.add('token_call', lambda event: names.append(event['name']))
+    calc.calculate('2000! + 1')
+    assert '!' in names and '+' in names
+
+
+def test_budget_error_is_not_folded_again():
+    """Exceeding the budget while folding stops the calculation."""
+    config = copy.deepcopy(CONFIG)
+    config['budget']['digits'] = 10
+    calc = Calculator(config=config)
+    calls = []
+    fold = calc.fold
+
+    def counting_fold(ls):
+        calls.append(ls)
+        return fold(ls)
+
+    calc.fold = counting_fold
+    calc.calculate('1 + 2 * 100!')
+    assert calc.get_answer() == (True, 'integer longer than 10 digits')
+    assert len(calls) == 1
@@ -0,0 +1,39 @@
+"""Tests of exponentiation and roots."""
+
+import pytest
+
+from clic.calculator import Calculator
+
+
+@pytest.fixture(scope='module')
+def calc():
+    return Calculator()
+
+
+@pytest.mark.parametrize('expr, answer', [
+    ('2^-2', '250 * 10^-3'),
+    ('sqrt(2)', '1.4142135623730950488017'),
+    ('2^0.5', '1.4142135623730950488017'),
+    ('e^1', '2.7182818284590452353603'),
+    ('27^(2:3)', '9'),
+    # Odd roots of negative numbers are real
+    ('(-8)^(1:3)', '-2'),
+    ('(-8)^(2:3)', '4'),
+    ('(8 m^3)^(1:3)', '2 m'),
+    # Fractional powers of units can be read back
+    ('(4 m)^(1:2)', '2 m^(1:2)'),
+    ('2 m^(1:2)', '2 m^(1:2)'),
+    ('m^(-3:2)', '1 m^(-3:2)'),
+    ('(2 m^(1:2))^2', '4 m'),
+])
+def test_answers(calc, expr, answer):
+    """Powers and roots of numbers and quantities."""
+    calc.calculate(expr)
+    assert calc.get_answer() == (False, answer)
+
+
+@pytest.mark.parametrize('expr', ['0^0', '0^-1', '(-8)^0.5'])
+def test_undefined(calc, expr):
+    """Undefined powers are errors."""
+    calc.calculate(expr)
+    assert calc.get_answer()[0]
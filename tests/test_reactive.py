@@ -0,0 +1,46 @@
+"""Tests of the reactive variables."""
+
+from clic.calculator import Calculator
+
+
+def answers(calc, *exprs):
+    """Return the answers of the expressions calculated in order."""
+    ans = []
+    for expr in exprs:
+        calc.calculate(expr)
+        ans.append(calc.get_answer())
+    return ans
+
+
+def test_dependents_are_updated():
+    """Reactive variables follow the variables they read."""
+    calc = Calculator()
+    assert answers(calc, 'a = 1', 'b := a + 1', 'c := 2 b', 'a = 2',
+                   'b', 'c') == [
+        (False, '1'), (False, '2'), (False, '4'), (False, '2'),
+        (False, '3'), (False, '6'),
+    ]
+
+
+def test_failed_update_changes_nothing():
+    """A dependent failing leaves the variable and all dependents as is."""
+    calc = Calculator()
+    answers(calc, 'a = 1', 'b := 1:a', 'c := a + 1')
+    flag, _ = answers(calc, 'a = 0')[0]
+    assert flag
+    assert answers(calc, 'a', 'b', 'c') == [
+        (False, '1'), (False, '1'), (False, '2'),
+    ]
+    # A failed definition leaves the variable as it was
+    assert answers(calc, 'a := 0')[0][0]
+    assert answers(calc, 'a = 2', 'b') == [
+        (False, '2'), (False, '500 * 10^-3'),
+    ]
+
+
+def test_circular_definition():
+    """Definitions reading themselves (maybe indirectly) are rejected."""
+    calc = Calculator()
+    answers(calc, 'a = 1', 'b := a + 1')
+    assert answers(calc, 'a := b') == [(True, 'circular definition')]
+    assert answers(calc, 'a') == [(False, '1')]
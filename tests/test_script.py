@@ -0,0 +1,67 @@
+"""Tests of running scripts and of their cache."""
+
+import io
+import json
+
+import pytest
+
+from clic import script
+from clic.calculator import Calculator
+
+SHEET = '''# A worksheet
+a = 2 m
+b = a * 3
+
+c = b + 1 m
+'''
+
+
+@pytest.fixture
+def sheet(tmp_path):
+    path = tmp_path / 'sheet.clic'
+    path.write_text(SHEET)
+    return path
+
+
+def run(path):
+    """Return the output of a script and the number of compilations."""
+    calc = Calculator()
+    compiled = []
+    compile_ls = calc.compile
+
+    def counting_compile(ls):
+        compiled.append(ls)
+        return compile_ls(ls)
+
+    calc.compile = counting_compile
+    out = io.StringIO()
+    assert script.run(calc, str(path), file=out) == 0
+    return out.getvalue(), len(compiled)
+
+
+def test_cached_run(sheet):
+    """An unchanged script is not compiled again."""
+    output, compiled = run(sheet)
+    assert output == 'a = 2 m = 2 m\nb = a * 3 = 6 m\nc = b + 1 m = 7 m\n'
+    assert compiled == 3
+    cache = json.loads((sheet.parent / 'sheet.clicc').read_text())
+    assert (cache['format'], cache['version']) \
+        == (script.FORMAT, script.VERSION)
+    assert run(sheet) == (output, 0)
+
+
+def test_changed_script(sheet):
+    """The cache of a changed script is not used."""
+    run(sheet)
+    sheet.write_text(SHEET.replace('3', '30'))
+    output, compiled = run(sheet)
+    assert 'b = a * 30 = 60 m' in output
+    assert compiled == 3
+
+
+def test_damaged_cache(sheet):
+    """A damaged cache is ignored and written again."""
+    output, _ = run(sheet)
+    (sheet.parent / 'sheet.clicc').write_text('{"format": "clic-c')
+    assert run(sheet) == (output, 3)
+    assert run(sheet) == (output, 0)
@@ -0,0 +1,86 @@
+"""Tests of saving and restoring sessions."""
+
+import json
+
+import pytest
+
+from clic import cli, session
+from clic.calculator import Calculator
+
+
+@pytest.fixture(autouse=True)
+def session_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(session, 'SESSION_DIR', str(tmp_path))
+    return tmp_path
+
+
+def answer(calc, expr):
+    """Return the answer of an expression."""
+    calc.calculate(expr)
+    return calc.get_answer()
+
+
+def test_round_trip():
+    """Variables and reactive definitions are restored."""
+    calc = Calculator()
+    for expr in ['a = 2', 'q = 3 m^(1:2)', 'arr = [1; 2.5; 3]',
+                 's = "text"', 'r := a + 1']:
+        answer(calc, expr)
+    assert answer(calc, 'save test') \
+        == (False, '"saved 5 variables to session \'test\'"')
+    calc = Calculator()
+    assert answer(calc, 'restore test') \
+        == (False, '"restored 5 variables from session \'test\'"')
+    assert answer(calc, 'q') == answer(Calculator(), '3 m^(1:2)')
+    assert answer(calc, 'arr') == (False, '[1; 2.5; 3]')
+    assert answer(calc, 's') == (False, '"text"')
+    assert answer(calc, 'a = 5') == (False, '5')
+    assert answer(calc, 'r') == (False, '6')
+
+
+def write_session(path, variables, version=session.VERSION):
+    """Write a session file with the given variables."""
+    data = {
+        'format': session.FORMAT,
+        'version': version,
+        'variables': variables,
+        'definitions': {},
+    }
+    path.write_text(json.dumps(data))
+
+
+@pytest.mark.parametrize('variables', [
+    {'a': ['d', 'not a number']},
+    {'a': ['d']},
+    {'a': ['q', ['d', '1'], [['m', 1, 0]]]},
+    {'a': ['ad', 5]},
+    {'a': 7},
+])
+def test_damaged_file(session_dir, variables):
+    """Damaged files are rejected with a SessionError."""
+    write_session(session_dir / 'test.json', variables)
+    with pytest.raises(session.SessionError, match='invalid session file'):
+        session.load('test')
+
+
+def test_not_json(session_dir):
+    """Files that are not sessions are rejected."""
+    (session_dir / 'test.json').write_text('{"format": "clic-sess')
+    with pytest.raises(session.SessionError, match='invalid session file'):
+        session.load('test')
+
+
+def test_newer_version(session_dir):
+    """Sessions of newer versions are not read."""
+    write_session(session_dir / 'test.json', {}, version=session.VERSION + 1)
+    with pytest.raises(session.SessionError, match='newer version'):
+        session.load('test')
+
+
+def test_damaged_autosave(session_dir, monkeypatch):
+    """A damaged autosave does not stop the calculator from starting."""
+    write_session(session_dir / 'autosave.json', {'a': ['d', 'x']})
+    monkeypatch.setattr(cli.atexit, 'register', lambda *args: None)
+    calc = Calculator()
+    cli.start_autosave(calc)
+    assert answer(calc, '2 + 2') == (False, '4')
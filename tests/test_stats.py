@@ -0,0 +1,63 @@
+"""Tests of the statistics module."""
+
+from decimal import Decimal
+import random
+
+import pytest
+
+from clic.calculator import Calculator
+
+
+@pytest.fixture(scope='module')
+def calc():
+    return Calculator()
+
+
+def answer(calc, expr):
+    """Return the answer of an expression (in the raw format)."""
+    calc.calculate(expr)
+    flag, ans = calc.get_answer('raw')
+    assert not flag, ans
+    return ans
+
+
+@pytest.mark.parametrize('expr, ans', [
+    ('Avg [1; 2; 3; 4]', '2.5'),
+    ('Variance [1; 2; 3; 4]', '1.25'),
+    ('Deviation [2; 4; 4; 4; 5; 5; 7; 9]', '2'),
+    ('Median [5; 1; 3]', '3'),
+    ('Median [4; 1; 3; 2]', '2.5'),
+    ('Median [2; 2; 2; 1]', '2'),
+    ('Quantile([1; 2; 3; 4; 5]; 0.25)', '2'),
+    ('Quantile([1; 2; 3; 4]; 0.5)', '2.5'),
+    ('Quantile([3; 1; 2]; 0)', '1'),
+    ('Quantile([3; 1; 2]; 1)', '3'),
+    ('Percentile([1; 2; 3; 4; 5]; 90)', '4.6'),
+])
+def test_answers(calc, expr, ans):
+    """Moments and order statistics of small arrays."""
+    assert answer(calc, expr) == ans
+
+
+def test_exact_moments(calc):
+    """The moments are exact for numbers of very different sizes."""
+    third = Decimal(answer(calc, 'Avg [10^20; 1; -10^20]'))
+    assert abs(third - Decimal(1) / 3) < Decimal('1E-20')
+    assert answer(calc, 'Variance [10^10 + 1; 10^10 + 3]') == '1'
+
+
+def test_selection_matches_sorting(calc):
+    """Order statistics by selection equal those of the sorted array."""
+    rng = random.Random(1)
+    for n in (2, 3, 8, 51):
+        ls = sorted(Decimal(rng.randint(-20, 20)) for _ in range(n))
+        array = '[' + '; '.join(map(str, rng.sample(ls, n))) + ']'
+        median = ls[n // 2] if n % 2 else (ls[n // 2 - 1] + ls[n // 2]) / 2
+        assert Decimal(answer(calc, f'Median {array}')) == median
+        for q in ('0', '0.1', '0.5', '0.75', '1'):
+            h = (n - 1) * Decimal(q)
+            k = int(h)
+            upper = ls[min(k + 1, n - 1)]
+            expected = ls[k] + (upper - ls[k]) * (h - k)
+            assert Decimal(answer(calc, f'Quantile({array}; {q})')) \
+                == expected